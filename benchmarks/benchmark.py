@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks the decoding performance of mediadecoder.
+
+The test clips are generated locally from the test sources of ffmpeg, so the
+results only depend on the machine, the installed versions of ffmpeg, MoviePy
+and numpy, and the code of mediadecoder. No window or sound device is needed.
+
+For every clip and decoding backend, the following is measured:
+
+- the time it takes to load the clip,
+- the sustained decoding speed in frames per second,
+- the latency of seeking to a random position,
+- the latency of decoding the keyframe before a random position (the preview
+  of Decoder.scrub()), and whether it is the right keyframe,
+- the cost of extracting an audio chunk,
+- the peak memory that is allocated while decoding.
+
+The results are written to a JSON file, which can be compared with the results
+of an earlier run::
+
+    python benchmarks/benchmark.py -o before.json
+    (change something)
+    python benchmarks/benchmark.py -o after.json --compare before.json
+"""
+import os
+import sys
+import time
+import json
+import random
+import logging
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+# Benchmark the working copy, instead of an installed version
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mediadecoder
+from mediadecoder.decoder import Decoder
+from mediadecoder.backends import available_backends
+from mediadecoder.backends._base import Backend
+from mediadecoder.backends.ffmpegbackend import ffmpeg_binary
+
+# The generated clips: name -> settings. gop is the number of frames between
+# keyframes, which determines how expensive seeking is. channels is the number
+# of audio channels (0 for no audio).
+clips = {
+    "240p25-gop12-stereo": dict(size=(320, 240), fps=25, gop=12, channels=2),
+    "480p30-gop250-mono": dict(size=(640, 480), fps=30, gop=250, channels=1),
+    "720p60-gop60-stereo": dict(size=(1280, 720), fps=60, gop=60, channels=2),
+    "1080p25-gop25-noaudio": dict(size=(1920, 1080), fps=25, gop=25, channels=0),
+    "1080p60-gop250-6ch": dict(size=(1920, 1080), fps=60, gop=250, channels=6),
+    "audio-44k-stereo": dict(size=None, fps=None, gop=None, channels=2),
+}
+
+# Duration of the generated clips in seconds
+clip_duration = 10
+# Seed for the random seek positions, so they are the same in each run
+seed = 1
+
+
+def generate_clip(name, settings, directory):
+    """Generates a test clip with ffmpeg, if it does not exist yet, and
+    returns its path."""
+    ext = ".mp4" if settings["size"] else ".wav"
+    path = os.path.join(directory, name + ext)
+    if os.path.isfile(path):
+        return path
+
+    args = [ffmpeg_binary(), "-y", "-loglevel", "error"]
+    if settings["size"]:
+        args += [
+            "-f", "lavfi", "-i", "testsrc2=size={0}x{1}:rate={2}:duration={3}".format(
+                settings["size"][0], settings["size"][1], settings["fps"],
+                clip_duration),
+        ]
+    if settings["channels"]:
+        # A different tone in each channel
+        sources = [
+            "sine=frequency={0}:sample_rate=44100:duration={1}".format(
+                220 * (channel + 1), clip_duration)
+            for channel in range(settings["channels"])
+        ]
+        for source in sources:
+            args += ["-f", "lavfi", "-i", source]
+        audio_inputs = range(1 if settings["size"] else 0,
+                             len(sources) + (1 if settings["size"] else 0))
+        args += [
+            "-filter_complex",
+            "{0}amerge=inputs={1}[a]".format(
+                "".join("[{}:a]".format(i) for i in audio_inputs), len(sources)),
+            "-map", "[a]",
+        ]
+    if settings["size"]:
+        args += [
+            "-map", "0:v", "-c:v", "libx264", "-preset", "veryfast",
+            "-pix_fmt", "yuv420p", "-g", str(settings["gop"]),
+            # Only place keyframes every gop frames, so their positions are
+            # known
+            "-sc_threshold", "0",
+        ]
+        if settings["channels"]:
+            args += ["-c:a", "aac"]
+    args.append(path)
+
+    logger.info("Generating {}".format(path))
+    subprocess.check_call(args)
+    return path
+
+
+def timed(func, *args, **kwargs):
+    """Calls func and returns the duration of the call in seconds, and its
+    return value."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def summarize(durations):
+    """Summarizes a list of durations in seconds as milliseconds."""
+    durations = np.asarray(durations) * 1000
+    return {
+        "median_ms": float(np.median(durations)),
+        "p95_ms": float(np.percentile(durations, 95)),
+        "max_ms": float(np.max(durations)),
+    }
+
+
+def bench_load(path, backend, repeats):
+    """Measures how long it takes to load the clip and close it again."""
+    durations = []
+    for _ in range(repeats):
+        duration, decoder = timed(Decoder, path, backend=backend)
+        durations.append(duration)
+        decoder.close()
+    return summarize(durations)
+
+
+def render_frame(decoder, t):
+    """Renders the frame at time t through the decoder, as the render loop
+    would."""
+    decoder.step(t, audio=False)
+
+
+def bench_decode(decoder, nframes):
+    """Measures the sustained speed of decoding consecutive frames."""
+    fps = decoder.fps
+    nframes = min(nframes, int(decoder.duration * fps) - 1)
+    # The first frame also includes starting the reader
+    render_frame(decoder, 0)
+    duration, _ = timed(
+        lambda: [render_frame(decoder, i / fps) for i in range(1, nframes + 1)])
+    return {"frames": nframes, "fps": nframes / duration}
+
+
+def bench_seek(decoder, nseeks):
+    """Measures the time it takes to render the frame at a random position."""
+    rng = random.Random(seed)
+    durations = []
+    for _ in range(nseeks):
+        t = rng.uniform(0, decoder.duration - 1)
+        duration, _ = timed(render_frame, decoder, t)
+        durations.append(duration)
+    return summarize(durations)
+
+
+def bench_keyframe(decoder, gop, nseeks):
+    """Measures the time it takes to decode the keyframe at or before a random
+    position, and checks that it equals the frame decoded at the time of that
+    keyframe."""
+    source = decoder.source
+    rng = random.Random(seed)
+    durations = []
+    mismatches = 0
+    for _ in range(nseeks):
+        t = rng.uniform(0, decoder.duration - 1)
+        duration, preview = timed(source.get_keyframe, t)
+        durations.append(duration)
+        keyframe_time = int(t * decoder.fps) // gop * gop / decoder.fps
+        expected = source.get_frame(keyframe_time)
+        if np.abs(preview.astype(np.int16) - expected).mean() > 1:
+            logger.warning("The keyframe before {:.3f}s is not the frame at "
+                           "{:.3f}s".format(t, keyframe_time))
+            mismatches += 1
+    result = summarize(durations)
+    result["mismatches"] = mismatches
+    return result
+
+
+def bench_audio(decoder, nchunks):
+    """Measures the cost of extracting consecutive audio chunks, as the audio
+    thread does."""
+    audioformat = decoder.audioformat
+    buffersize = audioformat["buffersize"]
+    nsamples = int(audioformat["fps"] * decoder.source.audio_duration)
+    nchunks = min(nchunks, nsamples // buffersize)
+    durations = []
+    for i in range(nchunks):
+        duration, _ = timed(decoder.source.read_audio, i * buffersize,
+                            (i + 1) * buffersize, audioformat["dtype"])
+        durations.append(duration)
+    result = summarize(durations)
+    result["chunk_samples"] = buffersize
+    # How many times faster than real time the audio is extracted
+    result["realtime_factor"] = \
+        nchunks * buffersize / float(audioformat["fps"]) / sum(durations)
+    return result
+
+
+def bench_memory(path, backend, nframes):
+    """Measures the peak memory allocated by Python and numpy while loading
+    the clip and decoding frames and audio. This runs separately, because
+    tracing the allocations slows everything down."""
+    tracemalloc.start()
+    try:
+        decoder = Decoder(path, backend=backend)
+        if not decoder.audio_only:
+            for i in range(min(nframes, int(decoder.duration * decoder.fps) - 1)):
+                render_frame(decoder, i / decoder.fps)
+        if decoder.audioformat:
+            buffersize = decoder.audioformat["buffersize"]
+            for i in range(nframes):
+                decoder.source.read_audio(i * buffersize, (i + 1) * buffersize,
+                                          decoder.audioformat["dtype"])
+        peak = tracemalloc.get_traced_memory()[1]
+        decoder.close()
+    finally:
+        tracemalloc.stop()
+    return {"peak_mb": peak / 1024.0 ** 2}
+
+
+def run_clip(path, backend, settings, args):
+    """Runs all benchmarks for a clip and returns the results."""
+    result = {"load": bench_load(path, backend, args.repeats)}
+    decoder = Decoder(path, backend=backend)
+    try:
+        if not decoder.audio_only:
+            result["decode"] = bench_decode(decoder, args.frames)
+            result["seek"] = bench_seek(decoder, args.seeks)
+            if not type(decoder.source).get_keyframe is Backend.get_keyframe:
+                # Backends without their own implementation simply decode the
+                # exact frame
+                result["keyframe"] = bench_keyframe(decoder, settings["gop"],
+                                                    args.seeks)
+        if decoder.audioformat:
+            result["audio"] = bench_audio(decoder, args.frames)
+    finally:
+        decoder.close()
+    result["memory"] = bench_memory(path, backend, args.frames)
+    return result
+
+
+def versions():
+    """The versions of the software that influences the results."""
+    info = {
+        "mediadecoder": mediadecoder.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+    try:
+        import moviepy
+
+        info["moviepy"] = moviepy.__version__
+    except ImportError:
+        info["moviepy"] = None
+    try:
+        output = subprocess.check_output([ffmpeg_binary(), "-version"])
+        info["ffmpeg"] = output.decode("utf8", "replace").splitlines()[0]
+    except (OSError, subprocess.CalledProcessError):
+        info["ffmpeg"] = None
+    return info
+
+
+def compare(results, previous):
+    """Prints the change of the main metrics relative to an earlier run."""
+    metrics = [
+        ("load", "median_ms"), ("decode", "fps"), ("seek", "median_ms"),
+        ("keyframe", "median_ms"),
+        ("audio", "median_ms"), ("memory", "peak_mb"),
+    ]
+    print("\nChange relative to {}:".format(previous["timestamp"]))
+    for key, result in sorted(results["results"].items()):
+        old = previous["results"].get(key)
+        if old is None:
+            continue
+        changes = []
+        for section, metric in metrics:
+            if section in result and section in old and old[section][metric]:
+                ratio = result[section][metric] / old[section][metric]
+                changes.append("{0}.{1} {2:+.1f}%".format(
+                    section, metric, (ratio - 1) * 100))
+        print("{0:<40} {1}".format(key, ", ".join(changes)))
+
+
+def print_results(results):
+    """Prints a short summary of the results."""
+    print("{0:<40} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+        "clip/backend", "load ms", "decode fps", "seek ms", "audio ms",
+        "peak MB"))
+    for key, result in sorted(results["results"].items()):
+        def value(section, metric, decimals=1):
+            if not section in result:
+                return "-"
+            return "{0:.{1}f}".format(result[section][metric], decimals)
+
+        print("{0:<40} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+            key, value("load", "median_ms"), value("decode", "fps"),
+            value("seek", "median_ms"), value("audio", "median_ms", 3),
+            value("memory", "peak_mb")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the decoding performance of mediadecoder.")
+    parser.add_argument(
+        "-o", "--output", help="the JSON file to write the results to "
+        "(default: benchmark-<time>.json)")
+    parser.add_argument(
+        "-c", "--compare", help="a JSON file with earlier results to compare with")
+    parser.add_argument(
+        "-b", "--backend", action="append", choices=available_backends(),
+        help="the backend to benchmark; can be given several times "
+        "(default: all)")
+    parser.add_argument(
+        "--clip", action="append", choices=sorted(clips),
+        help="the clip to benchmark; can be given several times (default: all)")
+    parser.add_argument(
+        "--media-dir", default=os.path.join(os.path.dirname(
+            os.path.abspath(__file__)), "media"),
+        help="the directory in which the test clips are generated and kept")
+    parser.add_argument(
+        "--frames", type=int, default=100,
+        help="the number of frames and audio chunks to decode (default: 100)")
+    parser.add_argument(
+        "--seeks", type=int, default=20,
+        help="the number of random seeks (default: 20)")
+    parser.add_argument(
+        "--repeats", type=int, default=3,
+        help="how often the clips are loaded (default: 3)")
+    parser.add_argument(
+        "-d", "--debug", help="print lots of info", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+
+    if not os.path.isdir(args.media_dir):
+        os.makedirs(args.media_dir)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "versions": versions(),
+        "settings": {
+            "frames": args.frames, "seeks": args.seeks,
+            "repeats": args.repeats, "clip_duration": clip_duration,
+        },
+        "results": {},
+    }
+    for name in args.clip or sorted(clips):
+        path = generate_clip(name, clips[name], args.media_dir)
+        for backend in args.backend or available_backends():
+            logger.info("Benchmarking {} with the {} backend".format(name, backend))
+            result = run_clip(path, backend, clips[name], args)
+            result.update(clip=name, backend=backend, **clips[name])
+            results["results"]["{}/{}".format(name, backend)] = result
+
+    output = args.output or "benchmark-{}.json".format(
+        time.strftime("%Y%m%d-%H%M%S"))
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print_results(results)
+    print("\nResults written to {}".format(output))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -4,8 +4,36 @@ __version__ = "0.2.3"
 __author__ = "Daniel Schreij"
 __license__ = "MIT"
 
+import importlib
+
 from .states import *
-from .decoder import Decoder
-from .timer import Timer
 
-__all__ = ["Decoder", "Timer"]
+# The public classes and the modules they are defined in. These modules (and
+# MoviePy, which the decoder depends on) are only imported when a class is
+# first accessed, so importing mediadecoder itself is cheap.
+_lazy_classes = {
+    "AsyncDecoder": ".asyncdecoder",
+    "Decoder": ".decoder",
+    "DecoderGroup": ".group",
+    "FrameMailbox": ".mailbox",
+    "FramePool": ".framepool",
+    "Scheduler": ".scheduler",
+    "Timer": ".timer",
+}
+
+__all__ = ["AsyncDecoder", "Decoder", "DecoderGroup", "FrameMailbox",
+           "FramePool", "Scheduler", "Timer"]
+
+
+def __getattr__(name):
+    if name in _lazy_classes:
+        module = importlib.import_module(_lazy_classes[name], __name__)
+        value = getattr(module, name)
+        # Cache the class, so this function is not called again for it
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_classes))
@@ -0,0 +1,232 @@
+"""Command line interface of mediadecoder.
+
+    python -m mediadecoder bench movie.mp4
+
+decodes a file without showing or playing it and reports whether this machine
+decodes it fast enough: the throughput, how late the frames were rendered, how
+many frames were dropped and how often the audio ran out. No window or sound
+device is needed. See ``python -m mediadecoder bench --help`` for the options.
+"""
+
+import sys
+import time
+import json
+import logging
+import argparse
+
+import numpy as np
+
+from .states import *
+from . import profiling
+from .decoder import Decoder
+from .backends import available_backends
+from .soundrenderers import get_renderer
+
+logger = logging.getLogger(__name__)
+
+
+class _FrameRecorder(object):
+    """Profiling hook that records the frame number and lateness of each frame
+    that a decoder passes to its video callback."""
+
+    def __init__(self, decoder):
+        self.decoder = decoder
+        self.frame_numbers = []
+        self.lateness = []
+
+    def __call__(self, phase, stage, frame_no, timestamp, source):
+        if stage != "render_callback" or phase != profiling.START or \
+                not source is self.decoder:
+            return
+        self.frame_numbers.append(frame_no)
+        # How long after the frame was due it is passed to the callback
+        due = frame_no * self.decoder.frame_interval
+        self.lateness.append(max(0.0, self.decoder.current_playtime - due))
+
+
+def _null_sink(frame):
+    """Video callback that discards the frames."""
+    pass
+
+
+def _open(args):
+    """Opens the file and, if it has audio, a null sound renderer that consumes
+    it."""
+    decoder = Decoder(args.mediafile, videorenderfunc=_null_sink,
+                      play_audio=not args.no_audio, backend=args.backend,
+                      audio_float=args.audio_float)
+    renderer = None
+    if decoder.audioformat:
+        renderer = get_renderer("null")(decoder.audioformat,
+                                        realtime=not args.fast)
+        decoder.set_audiorenderer(renderer)
+    return decoder, renderer
+
+
+def bench_realtime(decoder, renderer, max_duration=None):
+    """Plays the media in real time, as a player would, and measures how
+    well the decoder keeps up."""
+    recorder = _FrameRecorder(decoder)
+    profiling.add_hook(recorder)
+    try:
+        if not renderer is None:
+            renderer.start()
+        start = time.perf_counter()
+        decoder.play()
+        while decoder.status == PLAYING:
+            if not max_duration is None and \
+                    time.perf_counter() - start >= max_duration:
+                break
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        decoder.stop()
+    finally:
+        profiling.remove_hook(recorder)
+
+    results = {"mode": "realtime", "elapsed": elapsed}
+    if not decoder.audio_only:
+        frame_numbers = recorder.frame_numbers
+        shown = len(set(frame_numbers))
+        # Every frame up to the last one should have been shown
+        expected = max(frame_numbers) + 1 if frame_numbers else 0
+        lateness = np.asarray(recorder.lateness) * 1000
+        results.update(
+            frames=shown,
+            fps=shown / elapsed,
+            dropped_frames=expected - shown,
+            lateness_ms={
+                "p50": float(np.percentile(lateness, 50)),
+                "p95": float(np.percentile(lateness, 95)),
+                "p99": float(np.percentile(lateness, 99)),
+                "max": float(np.max(lateness)),
+            } if len(lateness) else None,
+        )
+    return results
+
+
+def bench_fast(decoder, renderer, max_duration=None):
+    """Decodes all frames and audio one after the other as fast as possible,
+    to measure the maximum throughput."""
+    duration = decoder.duration
+    if not max_duration is None:
+        duration = min(duration, max_duration)
+
+    if not renderer is None:
+        renderer.start()
+    start = time.perf_counter()
+    try:
+        frames = decoder.run_unthrottled(duration)
+    finally:
+        elapsed = time.perf_counter() - start
+        decoder.stop()
+
+    results = {
+        "mode": "fast",
+        "elapsed": elapsed,
+        "media_duration": duration,
+        "speed": duration / elapsed,
+    }
+    if not decoder.audio_only:
+        results.update(frames=frames, fps=frames / elapsed, dropped_frames=0,
+                       lateness_ms=None)
+    return results
+
+
+def bench(args):
+    """Runs the bench command."""
+    decoder, renderer = _open(args)
+    with profiling.StageTimer() as timer:
+        try:
+            if args.fast:
+                results = bench_fast(decoder, renderer, args.duration)
+            else:
+                results = bench_realtime(decoder, renderer, args.duration)
+        finally:
+            if not renderer is None:
+                renderer.close_stream()
+                renderer.join()
+            decoder.close()
+
+    results["file"] = args.mediafile
+    results["backend"] = args.backend or "moviepy"
+    if not renderer is None:
+        results["audio_underruns"] = renderer.stats["underruns"]
+        results["audio_silent_frames"] = renderer.stats["silent_frames"]
+    results["stages_ms"] = {
+        stage: {"mean": summary["mean"] * 1000, "max": summary["max"] * 1000}
+        for stage, summary in timer.summary().items()
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+    # Whether the file can be decoded in real time
+    if args.fast:
+        return 0 if results["speed"] >= 1.0 else 1
+    return 0 if not results.get("dropped_frames") and \
+        not results.get("audio_underruns") else 1
+
+
+def print_results(results):
+    """Prints the results of the bench command."""
+    print("File:              {}".format(results["file"]))
+    print("Backend:           {}".format(results["backend"]))
+    print("Mode:              {}".format(results["mode"]))
+    print("Elapsed:           {:.2f} s".format(results["elapsed"]))
+    if "speed" in results:
+        print("Speed:             {:.2f}x real time".format(results["speed"]))
+    if "frames" in results:
+        print("Frames:            {} ({:.1f} fps)".format(
+            results["frames"], results["fps"]))
+        print("Dropped frames:    {}".format(results["dropped_frames"]))
+    if results.get("lateness_ms"):
+        print("Frame lateness:    p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+              "p99 {p99:.1f} ms, max {max:.1f} ms".format(**results["lateness_ms"]))
+    if "audio_underruns" in results:
+        print("Audio underruns:   {} ({} silent samples)".format(
+            results["audio_underruns"], results["audio_silent_frames"]))
+    for stage, summary in sorted(results["stages_ms"].items()):
+        print("{:<18} mean {:.2f} ms, max {:.2f} ms".format(
+            stage + ":", summary["mean"], summary["max"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mediadecoder")
+    parser.add_argument(
+        "-d", "--debug", help="debugging mode: print lots of info",
+        action="store_true")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    bench_parser = commands.add_parser(
+        "bench", help="measure how fast a file is decoded, without showing "
+        "or playing it")
+    bench_parser.add_argument("mediafile", help="the path to the media file")
+    bench_parser.add_argument(
+        "-f", "--fast", action="store_true",
+        help="decode as fast as possible instead of in real time")
+    bench_parser.add_argument(
+        "-b", "--backend", choices=available_backends(),
+        help="the decoding backend (default: moviepy)")
+    bench_parser.add_argument(
+        "-t", "--duration", type=float,
+        help="stop after this many seconds (default: the whole file)")
+    bench_parser.add_argument(
+        "--no-audio", action="store_true", help="do not decode the audio")
+    bench_parser.add_argument(
+        "--audio-float", action="store_true",
+        help="decode the audio to floating point samples")
+    bench_parser.add_argument(
+        "--json", action="store_true", help="print the results as JSON")
+    bench_parser.set_defaults(func=bench)
+
+    args = parser.parse_args(argv)
+    if args.debug:
+        logging.basicConfig(level=logging.DEBUG)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
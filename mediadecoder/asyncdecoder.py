@@ -0,0 +1,204 @@
+import asyncio
+import logging
+
+from .states import *
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a frame stream in the subscriber queues
+_END = object()
+
+
+class AsyncDecoder(object):
+    """asyncio interface to a Decoder.
+
+    Frames are handed over from the decoder's render thread to the event loop
+    with call_soon_threadsafe(), so coroutines can wait for them without
+    polling::
+
+        decoder = AsyncDecoder(Decoder("movie.mp4"))
+        await decoder.play()
+        async for frame in decoder.frames():
+            show(frame)
+
+    The AsyncDecoder installs its own video and end-of-stream callbacks on the
+    decoder, so these should not be set on the decoder directly anymore. All
+    coroutines should be awaited from the same event loop.
+    """
+
+    def __init__(self, decoder):
+        """Constructor.
+
+        Parameters
+        ----------
+        decoder : Decoder
+                The decoder to control. It may already have a file loaded.
+        """
+        self.decoder = decoder
+        self._loop = None
+        self._eos = None
+        self._subscribers = []
+        self._frame_waiters = []
+        decoder.set_videoframerender_callback(self.__on_frame)
+        decoder.set_eos_callback(self.__on_eos)
+
+    @property
+    def status(self):
+        """Current playback status of the decoder."""
+        return self.decoder.status
+
+    async def frames(self, maxsize=1):
+        """Asynchronously iterates over the video frames as they are rendered.
+        The iteration ends when the end of the stream is reached or when the
+        decoder is stopped with stop().
+
+        Parameters
+        ----------
+        maxsize : int, optional
+                The number of frames that are kept for a consumer that can not
+                keep up. Once this number is reached, the oldest frame is
+                dropped to make room for a new one (default=1).
+
+        Yields
+        ------
+        numpy.ndarray
+                The video frames.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize needs to be at least 1")
+        self.__bind_loop()
+        queue = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        if self.decoder.status == EOS:
+            self.__put(queue, _END)
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is _END:
+                    return
+                yield frame
+        finally:
+            self._subscribers.remove(queue)
+
+    async def play(self):
+        """Starts the playback. Returns once playback has been started, i.e.
+        once the first frame has been rendered and the clock is running, so
+        that a seek() right after this is not undone."""
+        loop = self.__bind_loop()
+        self._eos.clear()
+        await loop.run_in_executor(None, self.decoder.play)
+        await loop.run_in_executor(None, self.__wait_started)
+
+    def __wait_started(self):
+        """Waits until the render thread of the decoder has started its
+        clock, or until playback has ended before that."""
+        decoder = self.decoder
+        while not decoder._clock_started.wait(0.05):
+            if not decoder.status in [PLAYING, PAUSED]:
+                return
+
+    def pause(self):
+        """Pauses or resumes the playback."""
+        self.decoder.pause()
+
+    async def seek(self, value, timeout=1.0):
+        """Seeks to the specified time. If this results in a different video
+        frame, returns once that frame has been rendered.
+
+        Parameters
+        ----------
+        value : str or int
+                The time to seek to. See Decoder.seek() for the accepted
+                formats.
+        timeout : float, optional
+                The maximum time in seconds to wait for the new frame
+                (default=1.0).
+        """
+        loop = self.__bind_loop()
+        decoder = self.decoder
+        previous_frame_no = decoder.current_frame_no
+        waiter = loop.create_future()
+        self._frame_waiters.append(waiter)
+        try:
+            await loop.run_in_executor(None, decoder.seek, value)
+            if not decoder.audio_only and \
+                    decoder.status in [PLAYING, PAUSED] and \
+                    decoder.current_frame_no != previous_frame_no:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("No frame was rendered within {}s after seeking".format(
+                timeout))
+        finally:
+            if waiter in self._frame_waiters:
+                self._frame_waiters.remove(waiter)
+
+    async def stop(self):
+        """Stops the playback and ends all running frame iterations."""
+        loop = self.__bind_loop()
+        await loop.run_in_executor(None, self.decoder.stop)
+        self.__finish()
+
+    async def wait_eos(self):
+        """Waits until the end of the stream has been reached, or until the
+        playback has been stopped with stop()."""
+        self.__bind_loop()
+        if self.decoder.status == EOS:
+            return
+        await self._eos.wait()
+
+    def __bind_loop(self):
+        """Binds the AsyncDecoder to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._eos = asyncio.Event()
+        elif not self._loop is loop:
+            raise RuntimeError("AsyncDecoder is bound to a different event loop")
+        return loop
+
+    def __call_in_loop(self, func, *args):
+        """Schedules func to be called in the event loop. Can be called from
+        any thread."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(func, *args)
+        except RuntimeError:
+            # The event loop has been closed
+            pass
+
+    def __on_frame(self, frame):
+        """Video callback of the decoder. Called from the render thread."""
+        self.__call_in_loop(self.__deliver, frame)
+
+    def __on_eos(self):
+        """End-of-stream callback of the decoder. Called from the render
+        thread."""
+        self.__call_in_loop(self.__finish)
+
+    def __deliver(self, frame):
+        """Passes a frame to all consumers. Runs in the event loop."""
+        for queue in self._subscribers:
+            self.__put(queue, frame)
+        for waiter in self._frame_waiters:
+            if not waiter.done():
+                waiter.set_result(frame)
+
+    def __finish(self):
+        """Ends all frame iterations and signals the end of the stream. Runs
+        in the event loop."""
+        for queue in self._subscribers:
+            self.__put(queue, _END)
+        if not self._eos is None:
+            self._eos.set()
+
+    def __put(self, queue, item):
+        """Puts item in queue, dropping the oldest item if it is full."""
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    def __repr__(self):
+        """Create a string representation for when print() is called."""
+        return "AsyncDecoder [{}]".format(self.decoder)
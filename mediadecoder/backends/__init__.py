@@ -0,0 +1,84 @@
+"""Decoding backends, which read the video frames and audio samples of a
+media file for Decoder.
+
+The backend of a decoder is selected by name with the `backend` argument of
+Decoder and Decoder.load_media():
+
+:moviepy: uses MoviePy's clips and readers (the default).
+:ffmpeg: reads raw frames and samples from ffmpeg subprocesses directly into
+    preallocated arrays, which avoids the overhead of MoviePy.
+
+Other backends can be added with register_backend(). They should subclass
+Backend.
+"""
+
+import importlib
+
+from ._base import Backend
+
+# The default backend
+default_backend = "moviepy"
+
+# The built-in backends: name -> (module, class name)
+_builtin_backends = {
+    "moviepy": (".moviepybackend", "MoviePyBackend"),
+    "ffmpeg": (".ffmpegbackend", "FFmpegBackend"),
+}
+
+# Backends added with register_backend(): name -> class
+_registered_backends = {}
+
+__all__ = ["Backend", "available_backends", "get_backend", "register_backend"]
+
+
+def register_backend(name, backend):
+    """Makes a decoding backend available under name.
+
+    Parameters
+    ----------
+    name : str
+            The name under which the backend can be selected.
+    backend : class
+            A subclass of Backend.
+    """
+    if not issubclass(backend, Backend):
+        raise TypeError("backend is not a subclass of Backend")
+    _registered_backends[name] = backend
+
+
+def available_backends():
+    """Returns the names of all known decoding backends.
+
+    Returns
+    -------
+    list of str
+    """
+    return sorted(set(_builtin_backends) | set(_registered_backends))
+
+
+def get_backend(name=None):
+    """Returns the class of a decoding backend. Only the module of this
+    backend is imported.
+
+    Parameters
+    ----------
+    name : str or class, optional
+            The name of the backend, or a Backend subclass, which is returned
+            as is. If None, the default backend is returned (default=None).
+
+    Raises
+    ------
+    ValueError
+            If no backend with this name is known.
+    """
+    if name is None:
+        name = default_backend
+    if isinstance(name, type) and issubclass(name, Backend):
+        return name
+    if name in _registered_backends:
+        return _registered_backends[name]
+    if name in _builtin_backends:
+        module, classname = _builtin_backends[name]
+        return getattr(importlib.import_module(module, __name__), classname)
+    raise ValueError("Unknown decoding backend: {}. Available are: {}".format(
+        name, ", ".join(available_backends())))
@@ -0,0 +1,194 @@
+class Backend(object):
+    """Base class for decoding backends. A backend instance opens a single
+    media file and decodes its video and/or audio stream.
+
+    Once a backend has been created, its streams are described by the
+    following attributes:
+
+    :filename: the path of the media file.
+    :duration: the duration of the media in seconds.
+    :has_video: whether a video stream is decoded.
+    :fps: the frame rate of the video stream (None without video).
+    :size: the (width, height) of the decoded video frames (None without
+        video).
+    :has_audio: whether an audio stream is decoded.
+    :audio_fps: the sample rate of the decoded audio (None without audio).
+    :audio_nchannels: the number of decoded audio channels (None without
+        audio).
+    :audio_nbytes: the number of bytes per sample the audio is decoded with
+        (None without audio).
+    :audio_duration: the duration of the audio stream in seconds (None
+        without audio).
+    """
+
+    #: The name under which the backend is registered
+    name = None
+
+    filename = None
+    duration = None
+    has_video = False
+    fps = None
+    size = None
+    has_audio = False
+    audio_fps = None
+    audio_nchannels = None
+    audio_nbytes = None
+    audio_duration = None
+
+    def __init__(self, mediafile, video=True, audio=True,
+                 target_resolution=None, audio_fps=44100, audio_nbytes=2,
+                 audio_nchannels=2):
+        """Constructor.
+        Opens the media file.
+
+        Parameters
+        ----------
+        mediafile : str
+                The path to the media file.
+        video : bool, optional
+                Whether the video stream should be decoded. If the file has no
+                video stream, only its audio is decoded (default=True).
+        audio : bool, optional
+                Whether the audio stream should be decoded. The audio of files
+                without a video stream is always decoded (default=True).
+        target_resolution : (int, int), optional
+                The (width, height) in pixels to scale the video frames to. If
+                either dimension is None, the aspect ratio is kept
+                (default=None).
+        audio_fps : int, optional
+                The sample rate to decode the audio with (default=44100).
+        audio_nbytes : int, optional
+                The number of bytes per sample to decode the audio with
+                (default=2).
+        audio_nchannels : int, optional
+                The number of channels to decode the audio with (default=2).
+
+        Raises
+        ------
+        IOError
+                If the file could not be opened, or has no stream that can be
+                decoded.
+        """
+        raise NotImplementedError(
+            "This class should be subclassed and not be instantiated directly."
+        )
+
+    @classmethod
+    def probe(cls, mediafile):
+        """Determines which streams a media file contains.
+
+        Parameters
+        ----------
+        mediafile : str
+                The path to the media file.
+
+        Returns
+        -------
+        dict
+                A dictionary with the fields 'duration', 'video_found',
+                'video_fps', 'video_size', 'audio_found' and 'audio_fps'.
+        """
+        raise NotImplementedError
+
+    def read_frame(self, out=None):
+        """Reads the next video frame.
+
+        Parameters
+        ----------
+        out : numpy.ndarray, optional
+                A uint8 array of shape (height, width, 3) to read the frame
+                into. If None, a new array is allocated (default=None).
+
+        Returns
+        -------
+        numpy.ndarray
+                The video frame.
+        """
+        raise NotImplementedError
+
+    def seek(self, t):
+        """Positions the video stream so that the next frame that is read is
+        the one shown at time t.
+
+        Parameters
+        ----------
+        t : float
+                The time in seconds.
+        """
+        raise NotImplementedError
+
+    def get_frame(self, t, out=None):
+        """Returns the video frame shown at time t. Reading the frames in
+        order is fast, other times require a seek.
+
+        Parameters
+        ----------
+        t : float
+                The time in seconds.
+        out : numpy.ndarray, optional
+                A uint8 array of shape (height, width, 3) to read the frame
+                into. If None, a new array is allocated (default=None).
+
+        Returns
+        -------
+        numpy.ndarray
+                The video frame.
+        """
+        raise NotImplementedError
+
+    def get_keyframe(self, t, out=None):
+        """Returns a frame close to time t that can be decoded quickly,
+        usually the keyframe at or before t. This is used to show a preview
+        while scrubbing. Backends that can not seek to keyframes return the
+        exact frame, as get_frame() does.
+
+        Parameters
+        ----------
+        t : float
+                The time in seconds.
+        out : numpy.ndarray, optional
+                A uint8 array of shape (height, width, 3) to read the frame
+                into. If None, a new array is allocated (default=None).
+
+        Returns
+        -------
+        numpy.ndarray
+                The video frame.
+        """
+        return self.get_frame(t, out)
+
+    def read_audio(self, start, stop, dtype, out=None):
+        """Decodes a range of audio samples. Reading consecutive ranges is
+        fast, other ranges require a seek.
+
+        Parameters
+        ----------
+        start : int
+                The index of the first sample.
+        stop : int
+                The index after the last sample.
+        dtype : str or numpy.dtype
+                The sample format: 'int8', 'int16' or 'int32' for integer
+                samples using their full range, or 'float32' for samples in the
+                range [-1, 1].
+        out : numpy.ndarray, optional
+                An array of shape (stop - start, audio_nchannels) and type
+                dtype to decode the samples into. If None, the samples are
+                returned in an array that may be reused by the next call
+                (default=None).
+
+        Returns
+        -------
+        numpy.ndarray
+                The samples, of shape (stop - start, audio_nchannels).
+                Samples beyond the end of the stream are silent.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Closes the streams and releases their resources."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        """Create a string representation for when print() is called."""
+        return "{} [{}]".format(self.__class__.__name__, self.filename)
@@ -0,0 +1,347 @@
+import os
+import re
+import logging
+import subprocess
+
+import numpy as np
+
+from ._base import Backend
+
+logger = logging.getLogger(__name__)
+
+# Raw output formats of ffmpeg for the supported sample types
+_audio_formats = {
+    "int8": ("s8", "pcm_s8"),
+    "int16": ("s16le", "pcm_s16le"),
+    "int32": ("s32le", "pcm_s32le"),
+    "float32": ("f32le", "pcm_f32le"),
+}
+
+# Number of frames up to which the video is decoded forward instead of seeking
+max_skip_frames = 100
+
+
+def ffmpeg_binary():
+    """Returns the path of the ffmpeg executable. This is the FFMPEG_BINARY
+    environment variable if it is set, otherwise the executable supplied by
+    imageio-ffmpeg if it is installed, and otherwise 'ffmpeg'."""
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary and binary != "auto-detect":
+        return binary
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        return "ffmpeg"
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def _readinto(stream, out):
+    """Reads from stream until out is filled or the stream ends. Returns the
+    number of bytes read."""
+    view = memoryview(out).cast("B")
+    total = 0
+    while total < len(view):
+        n = stream.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+class FFmpegBackend(Backend):
+    """Decodes media by reading raw frames and samples from ffmpeg
+    subprocesses.
+
+    Video frames and audio samples are read from the pipes directly into
+    numpy arrays, without the clip machinery of MoviePy. Audio is decoded by
+    ffmpeg in the requested sample format, so it does not need to be converted
+    either. Only the ffmpeg executable is needed (see ffmpeg_binary()).
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, mediafile, video=True, audio=True,
+                 target_resolution=None, audio_fps=44100, audio_nbytes=2,
+                 audio_nchannels=2):
+        """Constructor. See Backend.__init__."""
+        if not os.path.isfile(mediafile):
+            raise IOError("File not found: {0}".format(mediafile))
+        infos = self.probe(mediafile)
+        if not infos["video_found"] and not infos["audio_found"]:
+            raise IOError("No video or audio stream found in {}".format(
+                mediafile))
+
+        self.filename = mediafile
+        self.duration = infos["duration"]
+
+        self.has_video = video and infos["video_found"]
+        if self.has_video:
+            self.fps = infos["video_fps"]
+            self.size = self.__target_size(infos["video_size"],
+                                           target_resolution)
+            self._frame_shape = (self.size[1], self.size[0], 3)
+            # Frames that are skipped are read into this buffer
+            self._skip_buffer = np.empty(self._frame_shape, dtype=np.uint8)
+        self._video_proc = None
+        self._pos = 0
+        # A private copy of the last frame that was read, and its number. The
+        # frames that are returned belong to the caller (e.g. a FramePool that
+        # reuses them), so they are never kept.
+        self._last_frame = None
+        self._last_frame_no = None
+
+        # Files without video are always opened for their audio
+        self.has_audio = infos["audio_found"] and (audio or not self.has_video)
+        if self.has_audio:
+            self.audio_fps = audio_fps
+            self.audio_nchannels = audio_nchannels
+            self.audio_nbytes = audio_nbytes
+            self.audio_duration = self.duration
+        self._audio_proc = None
+        self._audio_pos = 0
+        self._audio_dtype = None
+        self._audio_buffer = None
+
+        if not self.has_video and not self.has_audio:
+            raise IOError("No audio stream found in {}".format(mediafile))
+
+    @classmethod
+    def probe(cls, mediafile):
+        """See Backend.probe. The information is parsed from the output of
+        ffmpeg -i."""
+        proc = subprocess.Popen(
+            [ffmpeg_binary(), "-hide_banner", "-i", mediafile],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        output = proc.communicate()[1].decode("utf8", "replace")
+
+        infos = {
+            "duration": None,
+            "video_found": False,
+            "video_fps": None,
+            "video_size": None,
+            "audio_found": False,
+            "audio_fps": None,
+        }
+        match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", output)
+        if match:
+            hours, minutes, seconds = match.groups()
+            infos["duration"] = \
+                int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        lines = output.splitlines()
+        for i, line in enumerate(lines):
+            if not infos["video_found"] and re.search(r"Stream #.*: Video: ", line):
+                size = re.search(r" (\d+)x(\d+)[,\s]", line)
+                fps = re.search(r"([\d.]+)(k?) fps", line) or \
+                    re.search(r"([\d.]+)(k?) tbr", line)
+                # Attached pictures (e.g. album art) are not a video stream
+                if not size or not fps or "attached pic" in line:
+                    continue
+                infos["video_found"] = True
+                width, height = int(size.group(1)), int(size.group(2))
+                # ffmpeg rotates the frames according to the display matrix
+                for next_line in lines[i + 1:i + 8]:
+                    if re.search(r"Stream #", next_line):
+                        break
+                    rotation = re.search(r"rotation of (-?[\d.]+) degrees",
+                                         next_line)
+                    if rotation and abs(int(float(rotation.group(1)))) in [90, 270]:
+                        width, height = height, width
+                infos["video_size"] = (width, height)
+                infos["video_fps"] = float(fps.group(1)) * \
+                    (1000 if fps.group(2) else 1)
+            elif not infos["audio_found"] and re.search(r"Stream #.*: Audio: ", line):
+                infos["audio_found"] = True
+                rate = re.search(r"(\d+) Hz", line)
+                if rate:
+                    infos["audio_fps"] = int(rate.group(1))
+        return infos
+
+    def __target_size(self, size, target_resolution):
+        """Determines the size of the output frames."""
+        if target_resolution is None:
+            return size
+        width, height = target_resolution
+        if width is None and height is None:
+            return size
+        if width is None:
+            width = int(round(size[0] * height / float(size[1])))
+        elif height is None:
+            height = int(round(size[1] * width / float(size[0])))
+        return (int(width), int(height))
+
+    def __open_video(self, frame_no):
+        """Starts an ffmpeg process that outputs raw frames from frame_no on."""
+        self.__close_video()
+        args = [ffmpeg_binary(), "-loglevel", "error"]
+        if frame_no > 0:
+            # Subtract a little, so that ffmpeg starts at this frame and not at
+            # the next one.
+            args += ["-ss", "%.06f" % (frame_no / float(self.fps) - 0.00001)]
+        args += [
+            "-i", self.filename, "-an",
+            "-vf", "scale=%d:%d" % self.size,
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+        ]
+        self._video_proc = subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=int(np.prod(self._frame_shape)) + 100,
+        )
+        self._pos = frame_no
+
+    def __close_video(self):
+        """Terminates the video process."""
+        self.__terminate(self._video_proc)
+        self._video_proc = None
+
+    def read_frame(self, out=None):
+        """See Backend.read_frame. At the end of the stream, the last frame is
+        returned again."""
+        if self._video_proc is None:
+            self.__open_video(self._pos)
+        if out is None:
+            out = np.empty(self._frame_shape, dtype=np.uint8)
+        if _readinto(self._video_proc.stdout, out) < out.nbytes:
+            logger.debug("End of the video stream of {}".format(self.filename))
+            if self._last_frame is None:
+                out.fill(0)
+            else:
+                out[...] = self._last_frame
+        else:
+            if self._last_frame is None:
+                self._last_frame = np.empty(self._frame_shape, dtype=np.uint8)
+            self._last_frame[...] = out
+            self._last_frame_no = self._pos
+            self._pos += 1
+        return out
+
+    def seek(self, t):
+        """See Backend.seek."""
+        self.__open_video(self.__frame_number(t))
+
+    def get_frame(self, t, out=None):
+        """See Backend.get_frame."""
+        frame_no = self.__frame_number(t)
+        if frame_no == self._last_frame_no:
+            # The frame has already been read
+            if out is None:
+                return self._last_frame.copy()
+            out[...] = self._last_frame
+            return out
+        if self._video_proc is None or frame_no < self._pos or \
+                frame_no > self._pos + max_skip_frames:
+            self.__open_video(frame_no)
+        while self._pos < frame_no:
+            if _readinto(self._video_proc.stdout, self._skip_buffer) \
+                    < self._skip_buffer.nbytes:
+                break
+            self._pos += 1
+        return self.read_frame(out)
+
+    def get_keyframe(self, t, out=None):
+        """See Backend.get_keyframe. Runs a separate ffmpeg process that only
+        decodes the keyframe at or before t, so the position of the main video
+        process is not affected."""
+        args = [
+            ffmpeg_binary(), "-loglevel", "error",
+            # Only decode keyframes, and output the keyframe that is seeked to
+            # instead of decoding on to the frame at t
+            "-skip_frame", "nokey", "-noaccurate_seek",
+            "-ss", "%.06f" % max(0, t),
+            # Keep the timestamps of the input. Otherwise the keyframe before
+            # t gets a negative timestamp, and is dropped in favor of the next
+            # keyframe.
+            "-copyts",
+            "-i", self.filename, "-an", "-frames:v", "1",
+            "-vf", "scale=%d:%d" % self.size,
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
+        ]
+        proc = subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        if out is None:
+            out = np.empty(self._frame_shape, dtype=np.uint8)
+        try:
+            nbytes = _readinto(proc.stdout, out)
+        finally:
+            self.__terminate(proc)
+        if nbytes < out.nbytes:
+            # E.g. t lies beyond the last keyframe of a damaged file
+            return self.get_frame(t, out)
+        return out
+
+    def __frame_number(self, t):
+        """The number of the frame shown at time t."""
+        # Add a little to prevent rounding errors (e.g. 2.9999 instead of 3)
+        return int(self.fps * t + 0.00001)
+
+    def __open_audio(self, start, dtype):
+        """Starts an ffmpeg process that outputs raw samples from sample
+        start on."""
+        self.__close_audio()
+        fmt, codec = _audio_formats[dtype.name]
+        args = [ffmpeg_binary(), "-loglevel", "error"]
+        if start > 0:
+            args += ["-ss", "%.06f" % (start / float(self.audio_fps))]
+        args += [
+            "-i", self.filename, "-vn",
+            "-f", fmt, "-acodec", codec,
+            "-ar", str(self.audio_fps), "-ac", str(self.audio_nchannels), "-",
+        ]
+        self._audio_proc = subprocess.Popen(
+            args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._audio_pos = start
+        self._audio_dtype = dtype
+
+    def __close_audio(self):
+        """Terminates the audio process."""
+        self.__terminate(self._audio_proc)
+        self._audio_proc = None
+
+    def read_audio(self, start, stop, dtype, out=None):
+        """See Backend.read_audio."""
+        dtype = np.dtype(dtype)
+        if not dtype.name in _audio_formats:
+            raise ValueError("Unsupported sample format: {}".format(dtype))
+        nsamples = stop - start
+        if out is None:
+            # Reuse the output buffer if it is large enough
+            buffer = self._audio_buffer
+            if buffer is None or buffer.dtype != dtype or \
+                    len(buffer) < nsamples:
+                buffer = np.empty((nsamples, self.audio_nchannels), dtype=dtype)
+                self._audio_buffer = buffer
+            out = buffer[:nsamples]
+
+        if self._audio_proc is None or start != self._audio_pos or \
+                dtype != self._audio_dtype:
+            self.__open_audio(start, dtype)
+        nbytes = _readinto(self._audio_proc.stdout, out)
+        read = nbytes // (dtype.itemsize * self.audio_nchannels)
+        if read < nsamples:
+            # Past the end of the stream
+            out[read:].fill(0)
+        self._audio_pos = stop
+        return out
+
+    def __terminate(self, proc):
+        """Terminates an ffmpeg process."""
+        if proc is None:
+            return
+        if proc.poll() is None:
+            proc.terminate()
+        proc.stdout.close()
+        proc.wait()
+
+    def close(self):
+        """See Backend.close."""
+        self.__close_video()
+        self.__close_audio()
+        self._last_frame = None
+        self._last_frame_no = None
@@ -0,0 +1,233 @@
+import logging
+
+import numpy as np
+
+from ._base import Backend
+
+logger = logging.getLogger(__name__)
+
+# MoviePy (which imports a lot of other modules) is only imported once the
+# first file is opened, by _import_moviepy().
+_moviepy_imported = False
+
+
+def _import_moviepy():
+    """Imports MoviePy into the module namespace, if this has not been done
+    yet."""
+    global _moviepy_imported, VideoFileClip, AudioClip, AudioFileClip, \
+        FFMPEG_AudioReader, ffmpeg_parse_infos, _AudioFileClip
+    if _moviepy_imported:
+        return
+
+    try:
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+        from moviepy.audio.AudioClip import AudioClip
+        from moviepy.audio.io.AudioFileClip import AudioFileClip
+        from moviepy.audio.io.readers import FFMPEG_AudioReader
+        from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    except ImportError as e:
+        try:
+            msg = str(e)
+        except:
+            msg = "Failed to decode Exception"
+        print(
+            """Error importing dependencies:
+{0}
+
+This module depends on the following packages
+
+- MoviePy
+- ImageIO
+- Numpy
+
+Please make sure that they are installed.""".format(msg)
+        )
+        raise
+
+    class _AudioFileClip(AudioFileClip):
+        """AudioFileClip of which the number of channels can be set as well, so
+        its reader directly decodes the requested format."""
+
+        def __init__(self, filename, buffersize=200000, fps=44100, nbytes=2,
+                     nchannels=2):
+            reader = FFMPEG_AudioReader(filename, buffersize, fps=fps,
+                                        nbytes=nbytes, nchannels=nchannels)
+            AudioClip.__init__(self, lambda t: reader.get_frame(t),
+                               duration=reader.duration, fps=fps)
+            self.filename = filename
+            self.reader = reader
+            self.buffersize = reader.buffersize
+
+    _moviepy_imported = True
+
+
+class MoviePyBackend(Backend):
+    """Decodes media with MoviePy's VideoFileClip and audio reader. This is
+    the default backend.
+
+    The MoviePy clips are available as the `clip` (None without video) and
+    `audio` (None without audio) attributes.
+    """
+
+    name = "moviepy"
+
+    # MoviePy can not decode 8 bit audio correctly, so it is then decoded as
+    # 16 bit audio and quantized to 8 bit afterwards.
+    # See https://github.com/Zulko/moviepy/issues/2397
+    _8bit_hack_applied = False
+
+    def __init__(self, mediafile, video=True, audio=True,
+                 target_resolution=None, audio_fps=44100, audio_nbytes=2,
+                 audio_nchannels=2):
+        """Constructor. See Backend.__init__."""
+        _import_moviepy()
+
+        clip = None
+        if video:
+            try:
+                clip = VideoFileClip(mediafile, audio=False,
+                                     target_resolution=target_resolution)
+            except (IOError, OSError):
+                # Only decode the audio if the file does not contain a video
+                # stream at all.
+                infos = self.probe(mediafile)
+                if infos["video_found"] or not infos["audio_found"]:
+                    raise
+                logger.debug("No video stream found in {}".format(mediafile))
+
+        audioclip = None
+        if clip is None or (audio and clip.reader.infos["audio_found"]):
+            # Create the audio reader ourselves, so that it directly decodes
+            # the requested number of channels.
+            self._8bit_hack_applied = audio_nbytes == 1
+            audioclip = _AudioFileClip(
+                mediafile, fps=audio_fps,
+                nbytes=2 if self._8bit_hack_applied else audio_nbytes,
+                nchannels=audio_nchannels,
+            )
+            if not clip is None:
+                clip.audio = audioclip
+        self.__set_clips(clip, audioclip)
+        self.filename = mediafile
+
+    @classmethod
+    def from_clip(cls, clip):
+        """Creates a backend for a MoviePy clip that has already been opened.
+
+        Parameters
+        ----------
+        clip : moviepy.video.VideoClip.VideoClip or moviepy.audio.AudioClip.AudioClip
+                A video clip (whose audio attribute is used for the audio), or
+                an audio clip for audio-only media.
+        """
+        _import_moviepy()
+        backend = cls.__new__(cls)
+        if isinstance(clip, AudioClip):
+            backend.__set_clips(None, clip)
+        else:
+            backend.__set_clips(clip, clip.audio)
+        return backend
+
+    def __set_clips(self, clip, audioclip):
+        """Sets the clips and the attributes that describe them."""
+        self.clip = clip
+        self.audio = audioclip
+        self._next_t = None
+        self._audio_buffer = None
+        self.filename = getattr(clip if not clip is None else audioclip,
+                                "filename", None)
+
+        self.has_video = not clip is None
+        if self.has_video:
+            self.fps = clip.fps
+            self.size = tuple(clip.size)
+            self.duration = clip.duration
+
+        self.has_audio = not audioclip is None
+        if self.has_audio:
+            self.audio_fps = audioclip.fps
+            self.audio_nchannels = audioclip.nchannels
+            if self._8bit_hack_applied:
+                self.audio_nbytes = 1
+            else:
+                reader = getattr(audioclip, "reader", None)
+                self.audio_nbytes = getattr(reader, "nbytes", 2)
+            self.audio_duration = audioclip.duration
+            if not self.has_video:
+                self.duration = audioclip.duration
+
+    @classmethod
+    def probe(cls, mediafile):
+        """See Backend.probe."""
+        _import_moviepy()
+        infos = ffmpeg_parse_infos(mediafile)
+        return {
+            "duration": infos.get("duration"),
+            "video_found": infos.get("video_found", False),
+            "video_fps": infos.get("video_fps"),
+            "video_size": infos.get("video_size"),
+            "audio_found": infos.get("audio_found", False),
+            "audio_fps": infos.get("audio_fps"),
+        }
+
+    def read_frame(self, out=None):
+        """See Backend.read_frame."""
+        if self._next_t is None:
+            frame = self.clip.reader.read_frame()
+        else:
+            frame = self.clip.get_frame(self._next_t)
+            self._next_t = None
+        return self.__output(frame, out)
+
+    def seek(self, t):
+        """See Backend.seek."""
+        # The reader seeks when the frame is retrieved
+        self._next_t = t
+
+    def get_frame(self, t, out=None):
+        """See Backend.get_frame."""
+        self._next_t = None
+        return self.__output(self.clip.get_frame(t), out)
+
+    def __output(self, frame, out):
+        """Copies frame into out, if it is specified."""
+        if out is None:
+            return frame
+        out[...] = frame
+        return out
+
+    def read_audio(self, start, stop, dtype, out=None):
+        """See Backend.read_audio."""
+        dtype = np.dtype(dtype)
+        nsamples = stop - start
+        if out is None:
+            # Reuse the output buffer if it is large enough
+            buffer = self._audio_buffer
+            if buffer is None or buffer.dtype != dtype or \
+                    len(buffer) < nsamples:
+                buffer = np.empty((nsamples, self.audio_nchannels), dtype=dtype)
+                self._audio_buffer = buffer
+            out = buffer[:nsamples]
+
+        fps = float(self.audio_fps)
+        # The reader can only return about half its buffer in one go
+        blocksize = max(1, getattr(self.audio, "buffersize", 200000) // 2)
+        for block_start in range(start, stop, blocksize):
+            block_stop = min(block_start + blocksize, stop)
+            samples = self.audio.to_soundarray(
+                tt=(1.0 / fps) * np.arange(block_start, block_stop),
+                buffersize=blocksize,
+            )
+            if dtype.kind != "f":
+                # Scale to the range of the integer format
+                np.clip(samples, -0.99, 0.99, out=samples)
+                samples *= 2 ** (8 * dtype.itemsize - 1)
+            out[block_start - start:block_stop - start] = samples
+        return out
+
+    def close(self):
+        """See Backend.close."""
+        if not self.audio is None:
+            self.audio.close()
+        if not self.clip is None:
+            self.clip.close()
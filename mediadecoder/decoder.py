@@ -4,30 +4,6 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-# MoviePy
-try:
-    from moviepy.video.io.VideoFileClip import VideoFileClip
-    from moviepy.audio.io.AudioFileClip import AudioFileClip
-    from moviepy.audio.io.readers import FFMPEG_AudioReader
-    import numpy as np
-except ImportError as e:
-    try:
-        msg = str(e)
-    except:
-        msg = "Failed to decode Exception"
-    print(
-        """Error importing dependencies:
-{0}
-
-This module depends on the following packages
-
-- MoviePy
-- ImageIO
-- Numpy
-
-Please make sure that they are installed.""".format(msg)
-    )
-
 # Other modules
 import os
 import time
@@ -38,16 +14,27 @@ logger = logging.getLogger(__name__)
 
 try:
     # Python 3
-    from queue import Queue, Full
+    from queue import Full
 except:
     # Python 2
-    from Queue import Queue, Full
-queue_length = 3
+    from Queue import Full
 
 from .states import *
-from .timer import Timer
-from .soundrenderers._base import SoundRenderer
-
+from .timer import Timer, cvsecs
+from .soundrenderers._base import SoundRenderer, AudioQueue
+from .backends import get_backend
+from .backends._base import Backend
+from .framepool import FramePool
+from .mailbox import FrameMailbox
+from . import profiling
+
+import numpy as np
+
+# Files with these extensions are opened in audio-only mode by default
+audio_extensions = (".wav", ".mp3", ".flac", ".ogg", ".oga", ".opus", ".m4a",
+                    ".aac", ".aif", ".aiff", ".wma")
+# Default number of samples per audio chunk for audio-only media
+audio_only_buffersize = 1024
 
 class Decoder(object):
     """This class loads a video file that can be played. It can
@@ -56,7 +43,10 @@ class Decoder(object):
 
     def __init__(self, mediafile=None, videorenderfunc=None, play_audio=True,
                  target_resolution=None, audio_fps=44100, audio_nbytes=2,
-                 audio_nchannels=2):
+                 audio_nchannels=2, audio_buffersize=None,
+                 preload_audio=False, audio_latency=100, audio_float=False,
+                 audio_only=None, scheduler=None, backend=None,
+                 frame_pool=None):
         """
 		Constructor.
 
@@ -82,18 +72,96 @@ class Decoder(object):
             2 for 16bit audio, 4 for 32bit audio (default=2).
         audio_nchannels : int, optional
             The number of channels to encode the audio with (default=2).
+        audio_buffersize : int, optional
+            The number of audio samples per chunk that is placed in the audio
+            queue. If None, a chunk lasts as long as one video frame
+            (default=None).
+        preload_audio : bool, optional
+            Whether the complete audio track should be decoded into memory
+            when the file is loaded (default=False).
+        audio_latency : float, optional
+            The target duration of audio to keep buffered, in milliseconds
+            (default=100).
+        audio_float : bool, optional
+            Whether audio should be decoded to 32bit floating point samples
+            instead of integers (default=False).
+        audio_only : bool, optional
+            Whether only the audio stream of the file should be decoded. If
+            None, this is determined from the file (default=None).
+        scheduler : Scheduler, optional
+            A scheduler that services the playback of this decoder from its
+            own thread, instead of the decoder starting a render and an audio
+            thread when play() is called (default=None).
+        backend : str or Backend, optional
+            The decoding backend to use, e.g. 'moviepy' or 'ffmpeg'. See
+            mediadecoder.backends. If None, MoviePy is used (default=None).
+        frame_pool : FramePool or bool, optional
+            Decode the video frames into the recycled buffers of this pool
+            instead of allocating a new array for each frame. True creates a
+            FramePool with the default settings. The frames that are passed
+            to videorenderfunc then need to be returned with release_frame(),
+            unless the pool releases them after a number of generations
+            (default=None).
 		"""
         # Create an internal timer
         self._clock = Timer()
+        self.scheduler = scheduler
+        self._loop = False
+        if frame_pool is True:
+            frame_pool = FramePool()
+        self.frame_pool = frame_pool or None
+        self._mailbox = FrameMailbox()
+        # Set once the clock of the current playback has been started; until
+        # then, starting the clock would undo a seek.
+        self._clock_started = threading.Event()
+        # Whether the playback is driven by step() instead of the clock
+        self._stepping = False
+
+        # Scrubbing state (see scrub()). The source lock makes sure the render
+        # thread and the scrub thread do not decode frames at the same time.
+        self.scrub_delay = 0.15
+        self._source_lock = threading.RLock()
+        self._scrub_condition = threading.Condition()
+        self._scrub_target = None
+        self._scrub_generation = 0
+        self._scrubbing = False
+        self._scrub_thread = None
+
+        # Gapless looping (see the loop property). The audio lock protects the
+        # source against being swapped while audio is decoded from it.
+        self.loop_cache_duration = 2.0
+        self.loop_cache_budget = 256 * 1024 ** 2
+        self._audio_lock = threading.RLock()
+        self._open_args = None
+        self._loop_spare = None
+        self._loop_ready = False
+        self._loop_head = None
+        self._loop_audio_head = None
+        self._loop_serving_head = False
+        self._audio_from_head = False
+        self._loop_thread = None
+
+        # Range playback (see play()). The frames and audio of the range are
+        # cached if they fit in range_cache_budget bytes.
+        self.range_cache_budget = 256 * 1024 ** 2
+        self._range_start = 0
+        self._range_end = None
+        # (index of the first frame or sample, frames or samples) or None
+        self._range_key = None
+        self._range_frames = None
+        self._range_audio = None
 
         # Load a video file if specified, but allow users to do this later
         # by initializing all variables to None
         self.reset()
         self.load_media(mediafile, play_audio, target_resolution, audio_fps,
-                        audio_nbytes, audio_nchannels)
+                        audio_nbytes, audio_nchannels, audio_buffersize,
+                        preload_audio, audio_latency, audio_float, audio_only,
+                        backend=backend)
 
         # Set callback function if set
         self.set_videoframerender_callback(videorenderfunc)
+        self.set_eos_callback(None)
 
         # Store instance variables
         self._play_audio = play_audio
@@ -110,9 +178,40 @@ class Decoder(object):
 
     @property
     def current_videoframe(self):
-        """Representation of current video frame as a numpy array."""
+        """Representation of current video frame as a numpy array. If a
+        frame pool is used, its buffer may be reused once it is released."""
         return self.__current_videoframe
 
+    @property
+    def mailbox(self):
+        """The FrameMailbox that holds the most recently rendered video frame,
+        for render loops that poll for frames instead of using a callback."""
+        return self._mailbox
+
+    def latest_frame(self, after=0):
+        """Returns the most recently rendered frame if it is newer than the
+        frame with sequence number after, without blocking. See
+        FrameMailbox.poll().
+
+        Returns
+        -------
+        MailboxFrame or None
+                A named tuple (sequence, frame_no, pts, timestamp, frame,
+                preview), or None if no newer frame has been rendered.
+        """
+        return self._mailbox.poll(after)
+
+    def wait_for_frame(self, after=0, timeout=None):
+        """Waits until a frame newer than the frame with sequence number after
+        has been rendered and returns it. Returns None if the timeout expires
+        or the playback stops first. See FrameMailbox.wait().
+
+        Returns
+        -------
+        MailboxFrame or None
+        """
+        return self._mailbox.wait(after, timeout)
+
     @property
     def current_playtime(self):
         """Clocks current runtime in seconds."""
@@ -125,7 +224,16 @@ class Decoder(object):
 
     @property
     def loop(self):
-        """Indicates whether the playback should loop."""
+        """Indicates whether the playback should loop.
+
+        Looping is gapless: while the clip plays, the first
+        `loop_cache_duration` seconds (2 by default, and at most
+        `loop_cache_budget` bytes of video frames, 256 MB by default) are
+        decoded into memory by a second reader, which is then positioned
+        right after this head. At the end of the clip, the readers are
+        swapped and the head is played from memory, so playback continues at
+        the first frame without seeking. The audio loops with the period of
+        the video, so both stay in sync however long the clip loops."""
         return self._loop
 
     @loop.setter
@@ -141,61 +249,109 @@ class Decoder(object):
         if not type(value) == bool:
             raise TypeError("can only be True or False")
         self._loop = value
+        if value and self.status in [PLAYING, PAUSED]:
+            self.__start_loop_preparation()
 
     @property
     def clip(self):
-        """Currently loaded media clip."""
-        return self._clip
+        """Currently loaded MoviePy clip: a VideoFileClip, or an AudioFileClip
+        for audio-only media. None if no file is loaded or if it is decoded by
+        another backend than MoviePy."""
+        if self._source is None:
+            return None
+        clip = getattr(self._source, "clip", None)
+        if clip is None:
+            clip = getattr(self._source, "audio", None)
+        return clip
 
     @clip.setter
     def clip(self, value):
-        """Currently loaded Moviepy VideoFileClip.
+        """Sets a MoviePy clip that has already been opened as the media to
+        decode.
 
         Parameters
         ----------
 
-        value : moviepy.video.io.VideoFileClip
+        value : moviepy.video.io.VideoFileClip or moviepy.audio.io.AudioFileClip
             the clip
 
         """
+        from .backends.moviepybackend import MoviePyBackend
+
+        self.__discard_loop_cache()
+        self.source = MoviePyBackend.from_clip(value)
+        # The file can not be opened again for gapless looping
+        self._open_args = None
+
+    @property
+    def source(self):
+        """The decoding backend that reads the loaded file (see
+        mediadecoder.backends)."""
+        return self._source
+
+    @source.setter
+    def source(self, value):
+        """Sets the decoding backend that reads the media.
 
-        self._clip = value
+        Parameters
+        ----------
+
+        value : mediadecoder.backends.Backend
+            An opened backend.
+
+        """
+        self._source = value
+        self._audio_only = not value.has_video
 
         ## Timing variables
         # Clip duration
-        self._clock.max_duration = self.clip.duration
-        logger.debug("Video clip duration: {}s".format(self.clip.duration))
-
-        # Frames per second of clip
-        self._clock.fps = self.clip.fps
-        logger.debug("Video clip FPS: {}".format(self.clip.fps))
+        self._clock.max_duration = value.duration
+        logger.debug("Clip duration: {}s".format(value.duration))
+
+        if self._audio_only:
+            # Without video, the clock ticks once per audio chunk
+            buffersize = self._audio_buffersize or audio_only_buffersize
+            self._clock.fps = max(1.0, float(value.audio_fps) / buffersize)
+            logger.debug("Audio-only clip, chunks per second: {}".format(
+                self._clock.fps))
+        else:
+            # Frames per second of clip
+            self._clock.fps = value.fps
+            logger.debug("Video clip FPS: {}".format(value.fps))
 
-        if self.clip.audio:
+        if self.audioformat:
             logger.debug("Audio loaded: \n{}".format(self.audioformat))
             logger.debug(
-                "Creating audio buffer of length:  {}".format(queue_length)
+                "Creating audio buffer with a latency of {} ms".format(
+                    self._audio_latency)
+            )
+            self.audioqueue = AudioQueue(
+                self.audioformat["fps"],
+                self.audioformat["buffersize"],
+                nchannels=self.audioformat["nchannels"],
+                dtype=self.audioformat["dtype"],
+                latency=self._audio_latency,
             )
-            self.audioqueue = Queue(queue_length)
 
         self._status = READY
 
     @property
     def loaded_file(self):
         """Name of loaded media file."""
-        if self.clip is not None:
-            return os.path.split(self.clip.filename)[1]
+        if self._source is not None and self._source.filename is not None:
+            return os.path.split(self._source.filename)[1]
 
     @property
     def fps(self):
         """Video frames per second."""
-        if self.clip is not None:
-            return self.clip.fps
+        if self._source is not None and not self._audio_only:
+            return self._source.fps
 
     @property
     def duration(self):
         """Total duration in seconds."""
-        if self.clip is not None:
-            return self.clip.duration
+        if self._source is not None:
+            return self._source.duration
 
     @property
     def status(self):
@@ -205,28 +361,55 @@ class Decoder(object):
     @property
     def audioformat(self):
         """Audio stream parameters."""
-        if self.clip is not None and self._play_audio and self.clip.audio:
-            if self._8bit_hack_applied:  # see https://github.com/Zulko/moviepy/issues/2397
-                nbytes = 1
+        if self._source is not None and self._play_audio and \
+                self._source.has_audio:
+            nbytes = self.__audio_nbytes()
+            if self._audio_buffersize:
+                buffersize = self._audio_buffersize
+            elif self._audio_only:
+                buffersize = audio_only_buffersize
             else:
-                nbytes = self.clip.audio.reader.nbytes
+                buffersize = int(self.frame_interval * self._source.audio_fps)
             return {
                 "nbytes": nbytes,
-                "nchannels": self.clip.audio.nchannels,
-                "fps": self.clip.audio.fps,
-                "buffersize": int(self.frame_interval * self.clip.audio.fps)
+                "dtype": self.__audio_dtype(),
+                "nchannels": self._source.audio_nchannels,
+                "fps": self._source.audio_fps,
+                "buffersize": buffersize
             }
 
+    @property
+    def audio_buffered_duration(self):
+        """Duration in seconds of the audio that is currently buffered."""
+        if self.audioformat:
+            return self.audioqueue.buffered_duration
+
+    @property
+    def audio_underruns(self):
+        """Number of times the audio buffer ran empty during playback."""
+        if self.audioformat:
+            return self.audioqueue.underruns
+
+    @property
+    def audio_only(self):
+        """Whether only the audio stream of the media is decoded."""
+        return self._audio_only
+
     @property
     def resolution(self):
         """Video resolution in pixels."""
-        if self.clip is not None:
-            return self.clip.size
+        if self._source is not None and not self._audio_only:
+            return self._source.size
 
     def reset(self):
-        """Resets the player and discards loaded data."""
-        self._clip = None
+        """Resets the player and discards loaded data. The readers of a loaded
+        file are closed."""
+        self.__close_source()
+        self._source = None
+        self._audio_only = False
         self._loaded_file = None
+        self.__current_videoframe = None
+        self._mailbox.clear()
 
         self._fps = None
         self._duration = None
@@ -235,19 +418,74 @@ class Decoder(object):
         self._clock.reset()
 
         self._loop_count = 0
-        self._8bit_hack_applied = False
+
+        self._audio_buffersize = None
+        self._audio_latency = 100
+        self._audio_float = False
+        self._audio_track = None
+        self._audio_cursor = 0
+        self._audio_nsamples = 0
+        self._pending_audioframe = None
+        # Incremented whenever the audio cursor is moved, to recognize chunks
+        # of the previous position.
+        self._audio_generation = 0
+        self._pending_generation = 0
+        self._reader_key = None
+        self._open_args = None
+        self._range_start = 0
+        self._range_end = None
+
+    def close(self):
+        """Stops the playback, waits for the playback threads to finish and
+        closes the readers of the loaded file, which terminates their ffmpeg
+        processes. Another file can be loaded afterwards.
+
+        The decoder can also be used as a context manager, which calls close()
+        on exit::
+
+            with Decoder("movie.mp4") as decoder:
+                decoder.play()
+                ...
+        """
+        if self.status in [PLAYING, PAUSED]:
+            self.stop()
+        else:
+            self.__join_threads()
+        self.__cancel_scrub()
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __close_source(self):
+        """Closes the readers of the loaded file, if any."""
+        self.__discard_loop_cache()
+        self.__discard_range_cache()
+        if getattr(self, "_source", None) is None:
+            return
+        logger.debug("Closing the readers of {}".format(self.loaded_file))
+        # Wait until a frame that is being scrubbed to has been decoded
+        with self._source_lock:
+            self._source.close()
 
     def load_media(self, mediafile, play_audio=True, target_resolution=None,
-                   audio_fps=44100, audio_nbytes=2, audio_nchannels=2):
+                   audio_fps=44100, audio_nbytes=2, audio_nchannels=2,
+                   audio_buffersize=None, preload_audio=False,
+                   audio_latency=100, audio_float=False, audio_only=None,
+                   reuse_reader=False, backend=None):
         """Loads a media file to decode.
 
         If an audiostream is detected, its parameters will be stored in a
         dictionary in the variable `audioformat`. This contains the fields
 
         :nbytes: the number of bytes in the stream (2 is 16-bit sound).
+        :dtype: the data type of the samples (e.g. 'int16' or 'float32').
         :nchannels: the channels (2 for stereo, 1 for mono)
         :fps: the frames per sec/sampling rate of the sound (e.g. 44100 KhZ).
-        :buffersize: the audioframes per buffer.
+        :buffersize: the audioframes per buffer (or chunk).
 
         If play_audio was set to False, or the video does not have an audiotrack,
         `audioformat` will be None.
@@ -270,6 +508,43 @@ class Decoder(object):
             2 for 16bit audio, 4 for 32bit audio (default=2).
         audio_nchannels : int, optional
             The number of channels to encode the audio with (default=2).
+        audio_buffersize : int, optional
+            The number of audio samples per chunk. Small chunks allow for
+            a lower latency, large chunks are more efficient. If None, a
+            chunk lasts as long as one video frame (default=None).
+        preload_audio : bool, optional
+            Decode the complete audio track into memory once, so that no
+            audio has to be decoded during playback, seeking or looping. This
+            is only advisable for short clips (default=False).
+        audio_latency : float, optional
+            The target duration of audio to keep buffered, in milliseconds.
+            The buffer temporarily grows when underruns occur and shrinks back
+            once playback is stable again (default=100).
+        audio_float : bool, optional
+            Decode the audio to 32bit floating point samples in the range
+            [-1, 1] instead of quantizing them to integers. audio_nbytes then
+            only determines the resolution at which ffmpeg decodes the audio
+            (default=False).
+        audio_only : bool, optional
+            Only decode the audio stream of the file, without creating a video
+            reader. The playback is then timed by the audio sample clock and
+            the chunk size defaults to 1024 samples. If None, this mode is used
+            for files with a common audio extension (e.g. .wav, .mp3 or .flac)
+            and for files without a video stream (default=None).
+        reuse_reader : bool, optional
+            If the same (unmodified) file is already loaded with the same
+            play_audio, target_resolution, audio_fps, audio_nbytes,
+            audio_nchannels and audio_only values, keep its readers instead of
+            opening the file again. This skips probing the file and starting
+            new readers. The audio that was decoded before (a preloaded audio
+            track, the cached head for looping and a range decoded by
+            preload_range()) is kept if the audio format (audio_float and
+            audio_buffersize) is unchanged, and discarded otherwise
+            (default=False).
+        backend : str or Backend, optional
+            The decoding backend that reads the file: 'moviepy' (the default),
+            'ffmpeg', or another backend from mediadecoder.backends
+            (default=None).
 
         Raises
         ------
@@ -279,21 +554,56 @@ class Decoder(object):
 
         if not mediafile is None:
             if os.path.isfile(mediafile):
-                if audio_nbytes == 1:
-                    self._8bit_hack_applied = True
-                    audio_nbytes = 2
-                self._play_audio = play_audio
-                self.clip = VideoFileClip(mediafile, audio=play_audio,
-                                          target_resolution=target_resolution,
-                                          audio_fps=audio_fps,
-                                          audio_nbytes=audio_nbytes)
-                if play_audio and audio_nchannels !=2:
-                    # Run FFMPEG_AudioReader again to set nchannels
-                    self.clip.audio.reader = FFMPEG_AudioReader(
-                        mediafile, self.clip.audio.reader.buffersize,
-                        fps=audio_fps, nbytes=audio_nbytes,
-                        nchannels=audio_nchannels)
-                    self.clip.audio.nchannels=audio_nchannels
+                if audio_buffersize is not None and audio_buffersize < 1:
+                    raise ValueError("audio_buffersize needs to be at least 1")
+                if self.status in [PLAYING, PAUSED]:
+                    self.stop()
+                self.__cancel_scrub()
+
+                if profiling.hooks:
+                    profiling.emit(profiling.START, "load_media", None, self)
+                try:
+                    # The parameters that determine how the readers are created
+                    reader_key = (os.path.abspath(mediafile),
+                                  os.path.getmtime(mediafile), play_audio,
+                                  target_resolution, audio_fps, audio_nbytes,
+                                  audio_nchannels, audio_only, get_backend(backend))
+                    reuse = reuse_reader and not self._source is None and \
+                        reader_key == self._reader_key
+                    previous_audioformat = self.audioformat
+
+                    self._play_audio = play_audio
+                    self._audio_buffersize = audio_buffersize
+                    self._audio_latency = audio_latency
+                    self._audio_float = audio_float
+                    self._pending_audioframe = None
+                    self._loop_count = 0
+                    self._clock.reset()
+
+                    if reuse:
+                        logger.debug("Reusing the readers of {}".format(mediafile))
+                        if self._audio_only:
+                            self._play_audio = True
+                        self.source = self._source
+                        if self.audioformat != previous_audioformat:
+                            # E.g. audio_float or audio_buffersize changed
+                            self.__discard_audio_caches()
+                    else:
+                        self.__close_source()
+                        self._source = None
+                        self._audio_track = None
+                        self.__open_source(mediafile, play_audio, target_resolution,
+                                           audio_fps, audio_nbytes, audio_nchannels,
+                                           audio_only, backend)
+                    self._reader_key = reader_key
+
+                    if not (preload_audio and self.audioformat):
+                        self._audio_track = None
+                    elif self._audio_track is None:
+                        self.__preload_audio()
+                finally:
+                    if profiling.hooks:
+                        profiling.emit(profiling.END, "load_media", None, self)
 
                 logger.debug("Loaded {0}".format(mediafile))
                 return True
@@ -301,6 +611,30 @@ class Decoder(object):
                 raise IOError("File not found: {0}".format(mediafile))
         return False
 
+    def __open_source(self, mediafile, play_audio, target_resolution,
+                      audio_fps, audio_nbytes, audio_nchannels, audio_only,
+                      backend):
+        """Opens mediafile with the decoding backend and sets it as the
+        source."""
+        if audio_only is None:
+            audio_only = \
+                os.path.splitext(mediafile)[1].lower() in audio_extensions
+
+        backend = get_backend(backend)
+        kwargs = dict(
+            video=not audio_only, audio=play_audio,
+            target_resolution=target_resolution, audio_fps=audio_fps,
+            audio_nbytes=audio_nbytes, audio_nchannels=audio_nchannels,
+        )
+        source = backend(mediafile, **kwargs)
+        if not source.has_video:
+            # Files without video are always opened for their audio
+            logger.debug("Decoding only the audio of {}".format(mediafile))
+            self._play_audio = True
+        self.source = source
+        # Allows opening a second reader for gapless looping
+        self._open_args = (backend, mediafile, kwargs)
+
     def set_videoframerender_callback(self, func):
         """Sets the function to call when a new frame is available.
         This function is passed the frame (in the form of a numpy.ndarray) and
@@ -317,6 +651,33 @@ class Decoder(object):
             raise TypeError("The object passed for videorenderfunc is not a function")
         self.__videorenderfunc = func
 
+    def release_frame(self, frame):
+        """Returns a frame that was passed to the video callback to the frame
+        pool, so that its buffer can be reused. Does nothing if the decoder
+        does not use a frame pool.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+                The frame, as it was passed to the video callback.
+        """
+        if not self.frame_pool is None:
+            self.frame_pool.release(frame)
+
+    def set_eos_callback(self, func):
+        """Sets the function to call when the end of the stream has been
+        reached. The function is called without arguments from the thread that
+        renders the video.
+
+        Parameters
+        ----------
+        func : callable
+                The function to call once the end of the stream is reached.
+        """
+        if not func is None and not callable(func):
+            raise TypeError("The object passed for the eos callback is not a function")
+        self.__eosfunc = func
+
     def set_audiorenderer(self, renderer):
         """Sets the SoundRenderer object. This should take care of processing
         the audioframes set in audioqueue.
@@ -344,16 +705,33 @@ class Decoder(object):
         self.soundrenderer = renderer
         self.soundrenderer.queue = self.audioqueue
 
-    def play(self):
+    def play(self, start=None, end=None):
         """Start the playback of the video.
         The playback loop is run in a separate thread, so this function returns
         immediately. This allows one to implement things such as event handling
         loops (e.g. check for key presses) elsewhere.
+
+        If start and/or end are given, only that range of the media is played.
+        Playback stops exactly at end (the end of stream is reached), or, if
+        loop is set, continues at start. If the frames and audio of the range
+        fit in `range_cache_budget` bytes (256 MB by default), they are decoded
+        into memory first (see preload_range()), so no decoding takes place
+        during playback. This call then blocks until the range has been
+        decoded.
+
+        Parameters
+        ----------
+        start : str or int, optional
+                The time at which to start, in any of the formats accepted by
+                seek() (default: the start of the media).
+        end : str or int, optional
+                The time at which to stop, in any of the formats accepted by
+                seek() (default: the end of the media).
         """
         ### First do some status checks
 
         # Make sure a file is loaded
-        if self.status == UNINITIALIZED or self.clip is None:
+        if self.status == UNINITIALIZED or self._source is None:
             raise RuntimeError("Player uninitialized or no file loaded")
 
         # Check if playback has already finished (rewind needs to be called first)
@@ -367,18 +745,25 @@ class Decoder(object):
             logger.warning("Video already started")
             return
 
-        ### If all is in order start the general playing loop
-        if self.status == READY:
-            self._status = PLAYING
+        self._range_start, self._range_end = self.__clip_range(start, end)
+        if self._range_start or not self._range_end is None:
+            self.preload_range(start, end)
+        self._clock.time = self._range_start
 
-        self.last_frame_no = 0
+        if self.loop:
+            self.__start_loop_preparation()
 
-        if not hasattr(self, "renderloop") or not self.renderloop.is_alive():
+        ### If all is in order start the general playing loop
+        if not self.scheduler is None:
+            # The scheduler's thread takes care of the rendering
+            self._start_playback()
+            if not self._audio_only:
+                self._render_videoframe()
+            self.__start_clock()
+            self.scheduler.add(self)
+        elif not hasattr(self, "renderloop") or not self.renderloop.is_alive():
+            self._start_playback()
             if self.audioformat:
-                # Chop the total stream into separate audio chunks that are the
-                # lenght of a video frame (this way the index of each chunk
-                # corresponds to the video frame it belongs to.)
-                self.__calculate_audio_frames()
                 # Start audio handling thread. This thread places audioframes
                 # into a sound buffer, untill this buffer is full.
                 self.audioframe_handler = threading.Thread(
@@ -392,6 +777,127 @@ class Decoder(object):
         else:
             logger.warning("Rendering thread already running!")
 
+    def _start_playback(self):
+        """Sets the status to PLAYING and positions the audio stream at the
+        current play time, without starting any threads."""
+        self._status = PLAYING
+        self._stepping = False
+        self._clock_started.clear()
+        # The frame that is rendered first, which the render loop should not
+        # render again
+        self.last_frame_no = int(self._clock.fps * self._range_start)
+        self._pending_audioframe = None
+        if self.audioformat:
+            # Position the audio cursor at the sample that corresponds to
+            # the current play time.
+            self._calculate_audio_frames()
+
+    def step(self, t, audio=True):
+        """Renders the playback at time t right away, without the playback
+        threads and without waiting for the clock. This allows processing or
+        benchmarking a file faster than real time. The video frame at t is
+        rendered (unless it is the frame that was rendered last) and, if audio
+        is True, the audio up to t is placed in the audio queue. If the queue
+        is full, this waits until the sound renderer has made room.
+
+        The first call starts the playback without starting any threads, and
+        stop() ends it. step() can not be used while the playback is driven
+        by play().
+
+        Parameters
+        ----------
+        t : float
+                The time in seconds to advance the playback to. When stepping
+                back in time, the audio continues at t, and when stepping
+                forward, all audio in between is queued.
+        audio : bool, optional
+                Whether to place the audio up to t in the audio queue
+                (default=True).
+
+        Returns
+        -------
+        bool
+                False if t lies at or beyond the end of the stream (or of the
+                range given to play()), in which case only the remaining audio
+                is queued.
+        """
+        self.__start_stepping()
+        end = self.__range_end()
+        if t >= end:
+            if audio:
+                self.__queue_audio(end)
+            return False
+        self._clock.time = t
+        if audio and self.audioformat and int(round(t * self.audioformat["fps"])) \
+                < self._audio_cursor - self.audioformat["buffersize"]:
+            # Stepped back in time
+            self._calculate_audio_frames()
+        frame_no = self._clock.current_frame
+        if not self._audio_only and frame_no != self.last_frame_no:
+            self._render_videoframe()
+            self.last_frame_no = frame_no
+        if audio:
+            self.__queue_audio(t)
+        return True
+
+    def run_unthrottled(self, end=None):
+        """Renders all video frames and queues all audio from the current
+        position up to end as fast as possible, using step().
+
+        Parameters
+        ----------
+        end : str or int, optional
+                The time at which to stop, in any of the formats accepted by
+                seek() (default: the end of the stream, or of the range given
+                to play()).
+
+        Returns
+        -------
+        int
+                The number of video frames that were rendered.
+        """
+        self.__start_stepping()
+        stop = self.__range_end()
+        if not end is None:
+            stop = min(stop, cvsecs(end))
+        frames = 0
+        if not self._audio_only:
+            interval = self.frame_interval
+            frame_no = self._clock.current_frame
+            if self.last_frame_no == frame_no:
+                frame_no += 1
+            while frame_no * interval < stop:
+                self.step(frame_no * interval)
+                frames += 1
+                frame_no += 1
+        self.__queue_audio(stop)
+        return frames
+
+    def __start_stepping(self):
+        """Starts the playback for step(), if it has not been started yet."""
+        if self._source is None:
+            raise RuntimeError("No file loaded")
+        if self._stepping and self.status == PLAYING:
+            return
+        if self.status != READY:
+            raise RuntimeError("step() can only be used when the playback is "
+                               "not running")
+        # A range only applies to the playback started by play()
+        self._range_start, self._range_end = 0, None
+        self._start_playback()
+        self._stepping = True
+        # The first frame has not been rendered yet
+        self.last_frame_no = None
+
+    def __queue_audio(self, t):
+        """Places the audio up to time t in the audio queue."""
+        if not self.audioformat:
+            return
+        stop = min(int(round(t * self.audioformat["fps"])), self._audio_nsamples)
+        while self.status == PLAYING and (self._audio_cursor < stop or
+                                          not self._pending_audioframe is None):
+            self._audio_step()
+
     def pause(self):
         """Pauses or resumes the video and/or audio stream."""
 
@@ -399,23 +905,45 @@ class Decoder(object):
         # (and not READY).
         logger.debug("Pausing playback")
         if self.status == PAUSED:
+            # The exact frame of a scrub request is no longer needed
+            self.__cancel_scrub(wait=False)
             # Recalculate audio stream position to make sure it is not out of
             # sync with the video
-            self.__calculate_audio_frames()
+            self._calculate_audio_frames()
             self._status = PLAYING
             self._clock.pause()
         elif self.status == PLAYING:
             self._status = PAUSED
             self._clock.pause()
+            if self.audioformat:
+                self.audioqueue.suspend()
 
     def stop(self):
-        """Stops the video stream and resets the clock."""
+        """Stops the video stream and resets the clock. Waits until the
+        rendering threads have finished."""
 
         logger.debug("Stopping playback")
         # Stop the clock
         self._clock.stop()
         # Set player status to ready
         self._status = READY
+        if self.audioformat:
+            self.audioqueue.suspend()
+        self._mailbox.wake()
+        self.__join_threads()
+
+    def __join_threads(self):
+        """Waits until the render and audio threads have finished, or until
+        the scheduler has stopped servicing the decoder. Should only be called
+        when the status is no longer PLAYING or PAUSED."""
+        if not self.scheduler is None:
+            self.scheduler.remove(self)
+        for name in ["renderloop", "audioframe_handler"]:
+            thread = getattr(self, name, None)
+            # The callbacks may call stop() from within these threads
+            if not thread is None and thread.is_alive() and \
+                    not thread is threading.current_thread():
+                thread.join()
 
     def seek(self, value):
         """Seek to the specified time.
@@ -432,39 +960,449 @@ class Decoder(object):
             >>> '01:01:33.045' -> 3693.045
             >>> '01:01:33,5' #comma works too
         """
+        # A seek supersedes scrubbing
+        self.__cancel_scrub()
         # Pause the stream
         self.pause()
-        # Make sure the movie starts at 1s as 0s gives trouble.
-        self._clock.time = max(0.5, value)
+        self._clock.time = max(0, cvsecs(value))
         logger.debug(
             "Seeking to {} seconds; frame {}".format(
                 self._clock.time, self._clock.current_frame
             )
         )
         if self.audioformat:
-            self.__calculate_audio_frames()
+            self._calculate_audio_frames()
         # Resume the stream
         self.pause()
 
+    def scrub(self, value):
+        """Seeks in two stages, to stay responsive while the user drags
+        through the video (e.g. with a slider). First, the keyframe at or
+        before the requested time is shown, which can be decoded quickly.
+        Once no new scrub request has arrived for `scrub_delay` seconds, the
+        exact frame is decoded and shown. A request that is superseded by a
+        newer one before its frame has been decoded is cancelled.
+
+        The frames are passed to the video callback and the mailbox (in which
+        the keyframe is marked as a preview) from a separate thread, and this
+        function returns immediately. If the video is playing, it is paused;
+        call pause() to resume playback from the scrubbed position.
+
+        Backends that can not decode keyframes separately (such as MoviePy)
+        directly show the exact frame.
+
+        Parameters
+        ----------
+        value : str or int
+                The time to scrub to, in any of the formats accepted by seek().
+        """
+        if self._source is None:
+            raise RuntimeError("No file loaded")
+        if self.status == PLAYING:
+            self.pause()
+        # Stay within the video, so scrubbing does not end the stream
+        value = min(max(0, cvsecs(value)), self.duration - self.frame_interval)
+        self._clock.time = value
+        if self.audioformat:
+            self._calculate_audio_frames()
+        if self._audio_only:
+            return
+
+        with self._scrub_condition:
+            self._scrub_generation += 1
+            self._scrub_target = value
+            self._scrubbing = True
+            if self._scrub_thread is None:
+                self._scrub_thread = threading.Thread(target=self.__scrub_thread)
+                self._scrub_thread.daemon = True
+                self._scrub_thread.start()
+            self._scrub_condition.notify_all()
+
+    @property
+    def scrubbing(self):
+        """Whether a scrub request is still being processed (see scrub())."""
+        return self._scrubbing
+
+    def __cancel_scrub(self, wait=True):
+        """Cancels the pending scrub requests and, if wait is True, waits
+        until the scrub thread has finished."""
+        with self._scrub_condition:
+            self._scrub_generation += 1
+            self._scrub_target = None
+            self._scrubbing = False
+            thread = self._scrub_thread
+            self._scrub_condition.notify_all()
+        if wait and not thread is None and \
+                not thread is threading.current_thread():
+            thread.join()
+
+    def __scrub_thread(self):
+        """Thread that decodes the frames requested with scrub(). Do not call
+        directly, but only as the target of a thread."""
+        while True:
+            with self._scrub_condition:
+                if self._scrub_target is None:
+                    # Nothing left to do; scrub() starts a new thread when
+                    # needed.
+                    self._scrub_thread = None
+                    return
+                target = self._scrub_target
+                generation = self._scrub_generation
+                self._scrub_target = None
+
+            if type(self._source).get_keyframe is Backend.get_keyframe:
+                # The backend would decode the exact frame anyway
+                self.__scrub_render(target, generation, keyframe=False)
+                continue
+
+            self.__scrub_render(target, generation, keyframe=True)
+            # Only decode the exact frame once the user stops dragging
+            with self._scrub_condition:
+                self._scrub_condition.wait_for(
+                    lambda: not self._scrub_target is None or
+                    generation != self._scrub_generation,
+                    self.scrub_delay,
+                )
+                if generation != self._scrub_generation:
+                    continue
+            self.__scrub_render(target, generation, keyframe=False)
+
+    def __scrub_render(self, target, generation, keyframe):
+        """Decodes and presents the (key)frame at target, unless the scrub
+        request has been superseded."""
+        with self._source_lock:
+            if generation != self._scrub_generation or self._source is None:
+                return
+            frame = self.__decode_frame(target, keyframe)
+        with self._scrub_condition:
+            # An exact frame that was superseded while decoding is discarded,
+            # but a keyframe is still closer to the new position than the
+            # frame that is currently shown.
+            if not keyframe and generation != self._scrub_generation:
+                if not self.frame_pool is None:
+                    self.frame_pool.release(frame)
+                return
+        frame_no = int(round(target * self._source.fps, 6))
+        self.__present_frame(frame, frame_no, preview=keyframe)
+        if not keyframe:
+            with self._scrub_condition:
+                if generation == self._scrub_generation:
+                    # The render loop does not need to render this frame again
+                    self.last_frame_no = frame_no
+                    self._scrubbing = False
+
     def rewind(self):
         """Rewinds the video to the beginning.
         Convenience function simply calling seek(0)."""
-        self.seek(0.5)
+        self.seek(0)
 
-    def __calculate_audio_frames(self):
+    def __start_loop_preparation(self):
+        """Prepares the second reader and the cached head of the clip for
+        gapless looping in a background thread, if this has not been done
+        yet."""
+        if self._open_args is None or self._loop_ready:
+            return
+        if self._range_start or self.__range_cached():
+            # Looping within a range that does not start at the beginning,
+            # or that is already in memory
+            return
+        if not self._loop_thread is None and self._loop_thread.is_alive():
+            return
+        self._loop_thread = threading.Thread(target=self.__prepare_loop)
+        self._loop_thread.daemon = True
+        self._loop_thread.start()
+
+    def __loop_head_size(self):
+        """The number of video frames and audio samples that are cached."""
+        nframes = 0
+        if not self._audio_only:
+            width, height = self._source.size
+            nframes = int(min(
+                self.loop_cache_duration * self._source.fps,
+                self.loop_cache_budget // (width * height * 3),
+                self.duration * self._source.fps,
+            ))
+        nsamples = 0
+        if self.audioformat and self._audio_track is None:
+            # A whole number of chunks, so that the chunks of the head and of
+            # the rest of the clip line up.
+            buffersize = self.audioformat["buffersize"]
+            nsamples = int(np.ceil(self.loop_cache_duration *
+                                   self.audioformat["fps"] / buffersize))
+            nsamples = max(1, nsamples) * buffersize
+            nsamples = min(nsamples, int(self.duration * self.audioformat["fps"]))
+        return nframes, nsamples
+
+    def __prepare_loop(self):
+        """Decodes the head of the clip with a second reader, which is left
+        positioned right after the head. Once the clip loops around, the
+        readers are swapped, after which this prepares the previous reader in
+        the same way. Do not call directly, but only as the target of a
+        thread."""
+        spare = self._loop_spare
+        try:
+            if spare is None:
+                backend, mediafile, kwargs = self._open_args
+                logger.debug("Opening a second reader for looping")
+                spare = backend(mediafile, **kwargs)
+                self._loop_spare = spare
+            nframes, nsamples = self.__loop_head_size()
+            fps = self._source.fps
+
+            if nframes and self._loop_head is None:
+                # Reading the head leaves the reader positioned after it
+                self._loop_head = [spare.get_frame(i / fps)
+                                   for i in range(nframes)]
+            elif not self._audio_only:
+                # Read the last frame of the head, so the first frame after it
+                # is read without seeking.
+                spare.get_frame(max(0, nframes - 1) / fps)
+
+            if nsamples:
+                dtype = self.audioformat["dtype"]
+                if self._loop_audio_head is None:
+                    head = np.empty((nsamples, self.audioformat["nchannels"]),
+                                    dtype=dtype)
+                    self._loop_audio_head = spare.read_audio(0, nsamples, dtype,
+                                                             out=head)
+                else:
+                    spare.read_audio(nsamples - 1, nsamples, dtype)
+        except Exception as e:
+            logger.warning("Could not prepare gapless looping: {}".format(e))
+            return
+
+        with self._audio_lock:
+            if self._loop_spare is spare:
+                self._loop_ready = True
+                logger.debug("Prepared looping with a head of {} frames and {} "
+                             "audio samples".format(nframes, nsamples))
+
+    def __loop_around(self):
+        """Continues playback at the start of the clip. If the second reader
+        has been prepared, it is swapped with the current one and the head of
+        the clip is played from memory."""
+        with self._source_lock, self._audio_lock:
+            if self._range_start:
+                # The cached head is only of use when looping to the start
+                pass
+            elif self._loop_ready:
+                self._source, self._loop_spare = self._loop_spare, self._source
+                self._loop_ready = False
+                self._loop_serving_head = not self._loop_head is None
+            else:
+                logger.debug("Looping before the second reader was prepared")
+        # Keep the time by which the end was overshot, so the clip keeps its
+        # exact period.
+        end = self.__range_end()
+        length = end - self._range_start
+        self._clock.time = self._range_start + \
+            max(0.0, self._clock.time - end) % length
+        self.last_frame_no = None
+        if self.status == PLAYING:
+            self.__start_loop_preparation()
+
+    def __discard_loop_cache(self):
+        """Closes the second reader and discards the cached head of the
+        clip."""
+        thread = getattr(self, "_loop_thread", None)
+        if not thread is None and thread.is_alive() and \
+                not thread is threading.current_thread():
+            thread.join()
+        with self._audio_lock:
+            spare = self._loop_spare
+            self._loop_spare = None
+            self._loop_ready = False
+            self._loop_head = None
+            self._loop_audio_head = None
+            self._loop_serving_head = False
+            self._audio_from_head = False
+        if not spare is None:
+            spare.close()
+
+    def __clip_range(self, start, end):
+        """Converts the start and end of a range to seconds within the media.
+        The end is None if the range extends to the end of the media."""
+        start = 0 if start is None else max(0, cvsecs(start))
+        if not end is None:
+            end = cvsecs(end)
+            if end >= self.duration:
+                end = None
+        if start >= (self.duration if end is None else end):
+            raise ValueError("The range is empty: {} - {}".format(start, end))
+        return start, end
+
+    def __range_end(self):
+        """The time at which playback stops (or loops around)."""
+        if self._range_end is None:
+            return self.duration
+        return self._range_end
+
+    def __range_cached(self):
+        """Whether the current range has been decoded into memory."""
+        return not self._range_key is None and \
+            self._range_key == (self._range_start, self._range_end)
+
+    def __start_clock(self):
+        """Starts the clock at the start of the played range."""
+        self._clock.start()
+        if self._range_start:
+            self._clock.time = self._range_start
+        self._clock_started.set()
+
+    def preload_range(self, start=None, end=None):
+        """Decodes the frames and audio from start up to end into memory, from
+        which play() with the same range then takes them. This can be called
+        well before play(), for instance while an experiment shows the
+        instructions of a trial. Nothing is decoded if the range does not fit
+        in `range_cache_budget` bytes. Only one range is kept in memory.
+
+        Parameters
+        ----------
+        start : str or int, optional
+                The start of the range, in any of the formats accepted by
+                seek() (default: the start of the media).
+        end : str or int, optional
+                The end of the range, in any of the formats accepted by seek()
+                (default: the end of the media).
+
+        Returns
+        -------
+        bool
+                Whether the range is in memory.
+        """
+        if self._source is None:
+            raise RuntimeError("No file loaded")
+        key = self.__clip_range(start, end)
+        if key == self._range_key:
+            return True
+        start, end = key
+        if end is None:
+            end = self.duration
+
+        first_frame = last_frame = 0
+        nbytes = 0
+        if not self._audio_only:
+            fps = self._source.fps
+            width, height = self._source.size
+            first_frame = int(fps * start)
+            # The frames that are shown before end
+            last_frame = min(int(np.ceil(round(fps * end, 6))),
+                             int(fps * self.duration))
+            nbytes += (last_frame - first_frame) * width * height * 3
+        first_sample = last_sample = 0
+        if self.audioformat and self._audio_track is None:
+            afps = self.audioformat["fps"]
+            first_sample = int(round(start * afps))
+            last_sample = min(int(round(end * afps)),
+                              int(afps * self._source.audio_duration))
+            nbytes += (last_sample - first_sample) * \
+                self.audioformat["nchannels"] * self.__audio_nbytes()
+        if nbytes > self.range_cache_budget:
+            logger.debug("The range {} - {} needs {} bytes, which is more "
+                         "than the budget".format(start, end, nbytes))
+            return False
+
+        self.__discard_range_cache()
+        logger.debug("Decoding {} - {} into memory".format(start, end))
+        with self._source_lock, self._audio_lock:
+            frames = [self._source.get_frame(i / self._source.fps)
+                      for i in range(first_frame, last_frame)]
+            audio = None
+            if last_sample > first_sample:
+                dtype = self.audioformat["dtype"]
+                audio = np.empty((last_sample - first_sample,
+                                  self.audioformat["nchannels"]), dtype=dtype)
+                audio = self._source.read_audio(first_sample, last_sample,
+                                                dtype, out=audio)
+            self._range_frames = (first_frame, frames) if frames else None
+            self._range_audio = None if audio is None else (first_sample, audio)
+            self._range_key = key
+        return True
+
+    def __discard_audio_caches(self):
+        """Discards all data that was decoded in the previous audio format:
+        the preloaded audio track, the cached head of the clip for looping
+        (whose second reader is prepared for the previous chunk size), and
+        the range decoded by preload_range(). These are decoded again when
+        they are needed."""
+        self._audio_track = None
+        self.__discard_loop_cache()
+        self.__discard_range_cache()
+
+    def __discard_range_cache(self):
+        """Discards the frames and audio decoded by preload_range()."""
+        with self._source_lock, self._audio_lock:
+            self._range_key = None
+            self._range_frames = None
+            self._range_audio = None
+
+    def _calculate_audio_frames(self):
         """Aligns audio with video.
         This should be called for instance after a seeking operation or resuming
         from a pause."""
 
         if self.audioformat is None:
             return
-        start_frame = self._clock.current_frame
-        totalsize = int(self.clip.audio.fps * self.clip.audio.duration)
-        self.audio_times = list(range(0, totalsize, self.audioformat["buffersize"])) + [
-            totalsize
-        ]
-        # Remove audio segments up to the starting frame
-        del self.audio_times[0:start_frame]
+        fps = self.audioformat["fps"]
+        self._audio_nsamples = int(fps * self._source.audio_duration)
+        if not self._range_end is None:
+            # Stop at the end of the played range
+            self._audio_nsamples = min(self._audio_nsamples,
+                                       int(round(self._range_end * fps)))
+        # Move the cursor to the sample that corresponds to the clock's time
+        self._audio_cursor = min(int(round(self._clock.time * fps)),
+                                 self._audio_nsamples)
+        # Discard the audio of the previous position that is still buffered,
+        # so it is not played before the audio of the new position.
+        self._audio_generation += 1
+        self._pending_audioframe = None
+        if not getattr(self, "audioqueue", None) is None:
+            self.audioqueue.flush()
+
+    def __preload_audio(self):
+        """Decodes the complete audio track into a single contiguous array,
+        from which the audio chunks are later sliced."""
+        audioformat = self.audioformat
+        nsamples = int(audioformat["fps"] * self._source.audio_duration)
+        logger.debug("Preloading {} audio samples".format(nsamples))
+        track = np.empty((nsamples, audioformat["nchannels"]),
+                         dtype=audioformat["dtype"])
+        self._source.read_audio(0, nsamples, track.dtype, out=track)
+        self._audio_track = track
+
+    def __audio_nbytes(self):
+        """The number of bytes per audio sample."""
+        if self._audio_float:
+            return 4
+        return self._source.audio_nbytes
+
+    def __audio_dtype(self):
+        """The data type of the audio samples."""
+        if self._audio_float:
+            return "float32"
+        return "int{}".format(8 * self.__audio_nbytes())
+
+    def __next_audio_chunk(self):
+        """Returns the (start, stop) sample indices of the next audio chunk and
+        advances the audio cursor, or None if the end of the stream has been
+        reached."""
+        nsamples = self._audio_nsamples
+        if self.loop:
+            # Loop the audio with the period of the video, so that they do not
+            # drift apart.
+            fps = self.audioformat["fps"]
+            nsamples = int(round(self.__range_end() * fps))
+            if self._audio_cursor >= nsamples:
+                self._audio_cursor = int(round(self._range_start * fps))
+                with self._audio_lock:
+                    self._audio_from_head = self._loop_ready and \
+                        not self._loop_audio_head is None
+        start = self._audio_cursor
+        if start >= nsamples:
+            return None
+        stop = min(start + self.audioformat["buffersize"], nsamples)
+        self._audio_cursor = stop
+        return start, stop
 
     def __render(self):
         """Main render loop.
@@ -474,35 +1412,15 @@ class Decoder(object):
         of rendering these frames."""
 
         # Render first frame
-        self.__render_videoframe()
+        if not self._audio_only:
+            self._render_videoframe()
 
         # Start videoclock with start of this thread
-        self._clock.start()
+        self.__start_clock()
 
         logger.debug("Started rendering loop.")
         # Main rendering loop
-        while self.status in [PLAYING, PAUSED]:
-            current_frame_no = self._clock.current_frame
-
-            # Check if end of clip has been reached
-            if self._clock.time >= self.duration:
-                logger.debug("End of stream reached at {}".format(self._clock.time))
-                if self.loop:
-                    logger.debug("Looping: restarting stream")
-                    # Seek to the start
-                    self.rewind()
-                    self._loop_count += 1
-                else:
-                    # End of stream has been reached
-                    self._status = EOS
-                    break
-
-            if self.last_frame_no != current_frame_no:
-                # A new frame is available. Get it from te stream
-                self.__render_videoframe()
-
-            self.last_frame_no = current_frame_no
-
+        while self._render_step():
             # Sleeping is a good idea to give the other threads some breathing
             # space to do their work.
             time.sleep(0.005)
@@ -511,70 +1429,207 @@ class Decoder(object):
         self._clock.stop()
         logger.debug("Rendering stopped.")
 
-    def __render_videoframe(self):
+    def _render_step(self):
+        """Performs a single iteration of the render loop: checks if the end
+        of the clip has been reached and renders a new video frame if one is
+        due.
+
+        Returns
+        -------
+        bool
+                False if playback has stopped or the end of the stream has been
+                reached, True otherwise.
+        """
+        if not self.status in [PLAYING, PAUSED]:
+            return False
+        if self._scrubbing:
+            # The scrub thread takes care of the frames
+            return True
+
+        current_frame_no = self._clock.current_frame
+
+        # Check if end of clip has been reached
+        if self._clock.time >= self.__range_end():
+            logger.debug("End of stream reached at {}".format(self._clock.time))
+            if self.loop:
+                logger.debug("Looping: restarting stream")
+                self.__loop_around()
+                self._loop_count += 1
+            else:
+                # End of stream has been reached
+                self._status = EOS
+                self._mailbox.wake()
+                if callable(self.__eosfunc):
+                    self.__eosfunc()
+                return False
+
+        if self.loop and self.last_frame_no is None:
+            # Just looped around
+            current_frame_no = self._clock.current_frame
+
+        if self.last_frame_no != current_frame_no and not self._audio_only:
+            # A new frame is available. Get it from te stream
+            self._render_videoframe()
+
+        self.last_frame_no = current_frame_no
+        return True
+
+    def _render_videoframe(self):
         """Retrieves a new videoframe from the stream.
 
         Sets the frame as the __current_video_frame and passes it on to
         __videorenderfunc() if it is set."""
 
-        new_videoframe = self.clip.get_frame(self._clock.time)
+        frame_no = self._clock.current_frame
+        profile = bool(profiling.hooks)
+        if profile:
+            profiling.emit(profiling.START, "decode_frame", frame_no, self)
+        with self._source_lock:
+            cached = self._range_frames
+            if not cached is None and \
+                    0 <= frame_no - cached[0] < len(cached[1]):
+                # Pre-decoded by preload_range()
+                new_videoframe = cached[1][frame_no - cached[0]]
+            elif self._loop_serving_head and frame_no < len(self._loop_head):
+                # The start of the clip after looping around
+                new_videoframe = self._loop_head[frame_no]
+            else:
+                self._loop_serving_head = False
+                new_videoframe = self.__decode_frame(self._clock.time)
+        if profile:
+            profiling.emit(profiling.END, "decode_frame", frame_no, self)
+        self.__present_frame(new_videoframe, frame_no)
+
+    def __decode_frame(self, t, keyframe=False):
+        """Decodes the frame at time t, or the keyframe before it, into a
+        buffer of the frame pool if one is used."""
+        out = None
+        if not self.frame_pool is None:
+            width, height = self._source.size
+            out = self.frame_pool.acquire((height, width, 3))
+        if keyframe:
+            return self._source.get_keyframe(t, out=out)
+        return self._source.get_frame(t, out=out)
+
+    def __present_frame(self, frame, frame_no, preview=False):
+        """Posts a decoded frame to the mailbox and passes it to the video
+        callback."""
+        self._mailbox.post(frame, frame_no, frame_no * self.frame_interval,
+                           preview)
+
         # Pass it to the callback function if this is set
         if callable(self.__videorenderfunc):
-            self.__videorenderfunc(new_videoframe)
+            profile = bool(profiling.hooks)
+            if profile:
+                profiling.emit(profiling.START, "render_callback", frame_no, self)
+            self.__videorenderfunc(frame)
+            if profile:
+                profiling.emit(profiling.END, "render_callback", frame_no, self)
         # Set current_frame to current frame (...)
-        self.__current_videoframe = new_videoframe
+        self.__current_videoframe = frame
+
+    def __decode_audio_chunk(self, start, stop):
+        """Decodes the audio samples from start up to stop from the stream.
+        Returns None if decoding failed."""
+        try:
+            # Extract the frames from the audio stream. Does not always,
+            # succeed (e.g. with bad streams missing frames), so make
+            # sure this doesn't crash the whole program.
+            with self._audio_lock:
+                return self._source.read_audio(start, stop,
+                                               self.audioformat["dtype"])
+        except OSError as e:
+            logger.warning("Sound decoding error: {}".format(e))
+            return None
+
+    def _audio_step(self, block=True):
+        """Performs a single iteration of the audio loop: retrieves the next
+        audio chunk if necessary and places it in the audio queue.
+
+        Parameters
+        ----------
+        block : bool, optional
+                Whether to wait (briefly) for space in the audio queue if it is
+                full (default=True).
+
+        Returns
+        -------
+        bool
+                True if a chunk was placed in the audio queue.
+        """
+        if self.status != PLAYING:
+            return False
+
+        if self._pending_audioframe is None:
+            # Get a new frame from the audiostream, skip to the next one
+            # if the current one gives a problem
+            self._pending_generation = self._audio_generation
+            chunk_range = self.__next_audio_chunk()
+            if chunk_range is None:
+                # End of the audio stream
+                self.audioqueue.suspend()
+                return False
+            start, stop = chunk_range
+
+            if profiling.hooks:
+                profiling.emit(profiling.START, "audio_decode",
+                               self._clock.current_frame, self)
+            cached = self._range_audio
+            if self._audio_track is not None:
+                # The audio is preloaded, so simply take a view on it
+                self._pending_audioframe = self._audio_track[start:stop]
+            elif not cached is None and cached[0] <= start and \
+                    stop - cached[0] <= len(cached[1]):
+                # Pre-decoded by preload_range()
+                self._pending_audioframe = cached[1][start - cached[0]:
+                                                     stop - cached[0]]
+            elif self._audio_from_head and stop <= len(self._loop_audio_head):
+                # The start of the clip after looping around
+                self._pending_audioframe = self._loop_audio_head[start:stop]
+            else:
+                self._audio_from_head = False
+                self._pending_audioframe = self.__decode_audio_chunk(start, stop)
+            if profiling.hooks:
+                profiling.emit(profiling.END, "audio_decode",
+                               self._clock.current_frame, self)
+
+        # Put audioframe in buffer/queue for soundrenderer to pick up. If
+        # the queue is full, try again after a timeout (this allows to check
+        # if the status is still PLAYING after a pause.)
+        if self._pending_generation != self._audio_generation:
+            # The cursor was moved while this chunk was decoded
+            self._pending_audioframe = None
+            return False
+        if not self._pending_audioframe is None:
+            profile = bool(profiling.hooks)
+            if profile:
+                frame_no = self._clock.current_frame
+                profiling.emit(profiling.START, "audio_put", frame_no, self)
+            try:
+                self.audioqueue.put(self._pending_audioframe, block, timeout=0.05)
+                self._pending_audioframe = None
+                if self._pending_generation != self._audio_generation:
+                    # The cursor was moved while this chunk was put, after
+                    # the buffer was flushed.
+                    self.audioqueue.flush()
+                return True
+            except Full:
+                pass
+            finally:
+                if profile:
+                    profiling.emit(profiling.END, "audio_put", frame_no, self)
+        return False
 
     def __audiorender_thread(self):
         """Thread that takes care of the audio rendering. Do not call directly,
         but only as the target of a thread."""
-        new_audioframe = None
         logger.debug("Started audio rendering thread.")
 
-        if self._8bit_hack_applied:
-            nbytes = 1
-        else:
-            nbytes = self.audioformat["nbytes"]
-
         while self.status in [PLAYING, PAUSED]:
-            # Retrieve audiochunk
-            if self.status == PLAYING:
-                if new_audioframe is None:
-                    # Get a new frame from the audiostream, skip to the next one
-                    # if the current one gives a problem
-                    try:
-                        start = self.audio_times.pop(0)
-                        stop = self.audio_times[0]
-                    except IndexError:
-                        logger.debug("Audio times could not be obtained")
-                        time.sleep(0.02)
-                        continue
-
-                    # Get the frame numbers to extract from the audio stream.
-                    chunk = (1.0 / self.audioformat["fps"]) * np.arange(start, stop)
-
-                    try:
-                        # Extract the frames from the audio stream. Does not always,
-                        # succeed (e.g. with bad streams missing frames), so make
-                        # sure this doesn't crash the whole program.
-                        new_audioframe = self.clip.audio.to_soundarray(
-                            tt=chunk,
-                            quantize=True,
-                            nbytes=nbytes,
-                            buffersize=self.frame_interval * self.clip.audio.fps,
-                        )
-                    except OSError as e:
-                        logger.warning("Sound decoding error: {}".format(e))
-                        new_audioframe = None
-                # Put audioframe in buffer/queue for soundrenderer to pick up. If
-                # the queue is full, try again after a timeout (this allows to check
-                # if the status is still PLAYING after a pause.)
-                if not new_audioframe is None:
-                    try:
-                        self.audioqueue.put(new_audioframe, timeout=0.05)
-                        new_audioframe = None
-                    except Full:
-                        pass
-
+            # Fill the audio buffer until it has reached its latency, so that
+            # small chunks are not limited to one per iteration.
+            while self._audio_step():
+                pass
             time.sleep(0.005)
 
         logger.debug("Stopped audio rendering thread.")
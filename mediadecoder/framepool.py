@@ -0,0 +1,159 @@
+# Python 3 compatibility
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FramePool(object):
+    """A fixed set of buffers into which the video frames are decoded, so that
+    a new full-resolution array does not have to be allocated for every frame.
+
+    A buffer that is handed out with acquire() is not reused until it is given
+    back with release(), or, if `generations` is set, until that many newer
+    frames have been acquired. When all buffers are in use, a frame is
+    allocated outside of the pool (this is counted in `misses`), so a consumer
+    that holds on to frames never has them overwritten.
+
+    Pass a FramePool to Decoder to use it::
+
+        pool = FramePool(size=4)
+        decoder = Decoder("movie.mp4", videorenderfunc=show, frame_pool=pool)
+
+        def show(frame):
+            upload_texture(frame)
+            decoder.release_frame(frame)
+    """
+
+    def __init__(self, size=3, generations=None):
+        """Constructor.
+
+        Parameters
+        ----------
+        size : int, optional
+                The number of buffers in the pool (default=3).
+        generations : int, optional
+                If set, a frame is returned to the pool automatically once this
+                many newer frames have been acquired, even if it has not been
+                released. With 1, a frame is only valid until the next frame is
+                decoded. If None, frames need to be released explicitly
+                (default=None).
+        """
+        if size < 1:
+            raise ValueError("size needs to be at least 1")
+        if not generations is None and generations < 1:
+            raise ValueError("generations needs to be at least 1")
+        self.size = size
+        self.generations = generations
+        self._lock = threading.Lock()
+        self._shape = None
+        self._dtype = None
+        self._free = []
+        # id of the buffer -> (buffer, generation in which it was acquired)
+        self._in_use = {}
+        self._generation = 0
+        self._misses = 0
+
+    @property
+    def free(self):
+        """The number of buffers that are available to be reused."""
+        return len(self._free)
+
+    @property
+    def in_use(self):
+        """The number of buffers that have been handed out and not been
+        returned yet."""
+        return len(self._in_use)
+
+    @property
+    def misses(self):
+        """The number of frames that had to be allocated outside of the pool
+        because all its buffers were in use."""
+        return self._misses
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Returns a buffer to decode a frame into. If the shape or data type
+        differs from that of the previous frames (e.g. because another file is
+        loaded), the existing buffers are discarded.
+
+        Parameters
+        ----------
+        shape : tuple of int
+                The shape of the frame, i.e. (height, width, channels).
+        dtype : numpy.dtype, optional
+                The data type of the frame (default=numpy.uint8).
+
+        Returns
+        -------
+        numpy.ndarray
+                An uninitialized buffer.
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            if shape != self._shape or dtype != self._dtype:
+                logger.debug("Frame pool buffers set to {} {}".format(shape, dtype))
+                self._shape = shape
+                self._dtype = dtype
+                self._free = []
+                self._in_use = {}
+
+            self._generation += 1
+            if not self.generations is None:
+                self.__reclaim(self._generation - self.generations)
+
+            if self._free:
+                buffer = self._free.pop()
+            elif len(self._in_use) < self.size:
+                buffer = np.empty(shape, dtype=dtype)
+            else:
+                # Do not keep track of this frame, so it is simply garbage
+                # collected once the consumer is done with it.
+                self._misses += 1
+                logger.debug("Frame pool exhausted; allocating a new frame")
+                return np.empty(shape, dtype=dtype)
+            self._in_use[id(buffer)] = (buffer, self._generation)
+            return buffer
+
+    def __reclaim(self, generation):
+        """Returns the buffers that were acquired in or before generation to
+        the pool."""
+        for key, (buffer, acquired) in list(self._in_use.items()):
+            if acquired <= generation:
+                del self._in_use[key]
+                self._free.append(buffer)
+
+    def release(self, frame):
+        """Returns a frame to the pool, after which its buffer can be reused
+        for a new frame. Frames that do not belong to the pool (or have been
+        returned already) are ignored.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+                A frame that was obtained from acquire().
+        """
+        with self._lock:
+            entry = self._in_use.get(id(frame))
+            if not entry is None and entry[0] is frame:
+                del self._in_use[id(frame)]
+                self._free.append(frame)
+
+    def clear(self):
+        """Discards all buffers of the pool."""
+        with self._lock:
+            self._shape = None
+            self._dtype = None
+            self._free = []
+            self._in_use = {}
+
+    def __repr__(self):
+        return "FramePool [buffers free: {0}, in use: {1}]".format(
+            self.free, self.in_use)
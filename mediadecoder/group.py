@@ -0,0 +1,276 @@
+# Python 3 compatibility
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+import threading
+import logging
+
+from .states import *
+from .timer import Timer, cvsecs
+
+logger = logging.getLogger(__name__)
+
+
+class DecoderGroup(object):
+    """Plays several decoders in sync, for instance a scene camera and an eye
+    camera recording that are shown side by side.
+
+    All decoders in the group follow a single master clock, so they can not
+    drift apart and play, pause and seek act on all streams at once. Instead
+    of each decoder running its own render and audio threads, one thread
+    renders the video frames and prefetches the audio of every decoder in the
+    group.
+
+    Each decoder keeps its own video callback and sound renderer. Looping is
+    handled by the group: when looping is enabled, all streams restart once
+    the longest one has ended.
+    """
+
+    def __init__(self, decoders=None, loop=False):
+        """Constructor.
+
+        Parameters
+        ----------
+        decoders : list of Decoder, optional
+                The decoders to play in sync. More can be added later with
+                add() (default=None).
+        loop : bool, optional
+                Indicates whether the group should restart once all streams
+                have ended (default=False).
+        """
+        self._clock = Timer()
+        self._decoders = []
+        self._status = READY
+        self._loop_count = 0
+        self.loop = loop
+        if not decoders is None:
+            for decoder in decoders:
+                self.add(decoder)
+
+    @property
+    def decoders(self):
+        """The decoders in the group."""
+        return tuple(self._decoders)
+
+    @property
+    def status(self):
+        """Current playback status of the group."""
+        return self._status
+
+    @property
+    def current_playtime(self):
+        """Current time of the master clock in seconds."""
+        return self._clock.time
+
+    @property
+    def duration(self):
+        """Duration in seconds of the longest stream in the group."""
+        return max([decoder.duration for decoder in self._decoders] or [0.0])
+
+    @property
+    def loop_count(self):
+        """Indicates how often the group has looped."""
+        return self._loop_count
+
+    @property
+    def loop(self):
+        """Indicates whether the playback should loop."""
+        return self._loop
+
+    @loop.setter
+    def loop(self, value):
+        """Indicates whether the playback should loop.
+
+        Parameters
+        ----------
+        value : bool
+                True if playback should loop, False if not.
+        """
+        if not type(value) == bool:
+            raise TypeError("can only be True or False")
+        self._loop = value
+
+    def add(self, decoder):
+        """Adds a decoder to the group. Its clock starts to follow the master
+        clock of the group.
+
+        Parameters
+        ----------
+        decoder : Decoder
+                The decoder to add. It should have a file loaded and should not
+                be playing on its own.
+
+        Raises
+        ------
+        RuntimeError
+                If the decoder has no file loaded, is playing, or the group is
+                playing.
+        """
+        if decoder.status == UNINITIALIZED or decoder.source is None:
+            raise RuntimeError("Decoder uninitialized or no file loaded")
+        if decoder.status in [PLAYING, PAUSED]:
+            raise RuntimeError("Decoder is already playing")
+        if self.status in [PLAYING, PAUSED]:
+            raise RuntimeError("Cannot add decoders while the group is playing")
+        if decoder in self._decoders:
+            return
+        decoder.loop = False
+        decoder._clock.master = self._clock
+        self._decoders.append(decoder)
+
+    def remove(self, decoder):
+        """Removes a decoder from the group. Its clock stops following the
+        master clock.
+
+        Parameters
+        ----------
+        decoder : Decoder
+                The decoder to remove.
+
+        Raises
+        ------
+        RuntimeError
+                If the group is playing.
+        """
+        if self.status in [PLAYING, PAUSED]:
+            raise RuntimeError("Cannot remove decoders while the group is playing")
+        self._decoders.remove(decoder)
+        decoder._clock.master = None
+
+    def play(self):
+        """Starts the playback of all decoders in the group at the same time.
+        The playback loop is run in a separate thread, so this function returns
+        immediately.
+        """
+        if not self._decoders:
+            raise RuntimeError("No decoders have been added to the group")
+
+        if self.status == EOS:
+            logger.debug("End of stream has already been reached")
+            return
+
+        if self.status in [PLAYING, PAUSED]:
+            logger.warning("Group already started")
+            return
+
+        for decoder in self._decoders:
+            decoder._start_playback()
+            if not decoder.audio_only:
+                decoder._render_videoframe()
+
+        self._status = PLAYING
+        self._clock.start()
+        self.renderloop = threading.Thread(target=self.__render)
+        self.renderloop.start()
+
+    def pause(self):
+        """Pauses or resumes all streams in the group."""
+        logger.debug("Pausing group playback")
+        if self.status == PAUSED:
+            for decoder in self._decoders:
+                if decoder.status == PAUSED:
+                    # Make sure the audio is in sync with the master clock
+                    if decoder.audioformat:
+                        decoder._calculate_audio_frames()
+                    decoder._status = PLAYING
+            self._status = PLAYING
+            self._clock.pause()
+        elif self.status == PLAYING:
+            self._status = PAUSED
+            self._clock.pause()
+            for decoder in self._decoders:
+                if decoder.status == PLAYING:
+                    decoder._status = PAUSED
+                    if decoder.audioformat:
+                        decoder.audioqueue.suspend()
+
+    def stop(self):
+        """Stops all streams in the group and waits for the rendering thread
+        to finish."""
+        logger.debug("Stopping group playback")
+        self._status = READY
+        if hasattr(self, "renderloop") and self.renderloop.is_alive():
+            if not self.renderloop is threading.current_thread():
+                self.renderloop.join()
+        for decoder in self._decoders:
+            decoder.stop()
+        self._clock.stop()
+
+    def seek(self, value):
+        """Seeks all streams in the group to the same time. The current video
+        frame of each decoder is rendered straight away, even when the group
+        is paused.
+
+        Parameters
+        ----------
+        value : str or int
+                The time to seek to. See Decoder.seek() for the accepted
+                formats.
+        """
+        was_playing = self.status == PLAYING
+        if was_playing:
+            self.pause()
+
+        # Setting the master clock moves all streams at once
+        self._clock.time = max(0.0, cvsecs(value))
+        logger.debug("Group seeking to {} seconds".format(self._clock.time))
+
+        active = self.status in [PLAYING, PAUSED]
+        for decoder in self._decoders:
+            if active and decoder.status == EOS and \
+                    self._clock.time < decoder.duration:
+                # The stream was finished, but should be shown again
+                decoder._status = PAUSED
+            if decoder.audioformat:
+                decoder._pending_audioframe = None
+                decoder._calculate_audio_frames()
+            if not decoder.audio_only and decoder.status == PAUSED:
+                decoder._render_videoframe()
+                decoder.last_frame_no = decoder.current_frame_no
+
+        if was_playing:
+            self.pause()
+
+    def rewind(self):
+        """Rewinds all streams to the beginning."""
+        self.seek(0)
+
+    def __render(self):
+        """Main render loop of the group: renders the video frames and fills
+        the audio buffers of all decoders. Do not call directly, but only as
+        the target of a thread."""
+        logger.debug("Started group rendering loop.")
+        while self.status in [PLAYING, PAUSED]:
+            active = False
+            for decoder in self._decoders:
+                if decoder._render_step():
+                    active = True
+                if decoder.audioformat:
+                    # Fill the audio buffer until it has reached its latency
+                    while decoder._audio_step(block=False):
+                        pass
+
+            if not active and self.status == PLAYING:
+                logger.debug("End of all streams reached")
+                if self.loop:
+                    for decoder in self._decoders:
+                        decoder._start_playback()
+                    self.rewind()
+                    self._loop_count += 1
+                else:
+                    self._status = EOS
+                    break
+
+            time.sleep(0.005)
+
+        self._clock.stop()
+        logger.debug("Group rendering stopped.")
+
+    def __repr__(self):
+        """Create a string representation for when print() is called."""
+        return "DecoderGroup [{} decoders, status: {}]".format(
+            len(self._decoders), self.status
+        )
@@ -0,0 +1,140 @@
+# Python 3 compatibility
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import time
+import threading
+from collections import namedtuple
+
+# A frame in the mailbox. sequence increases by one for every frame that is
+# posted, pts is the position of the frame in the media in seconds and
+# timestamp the time.perf_counter() value at which the frame was posted.
+# preview is True for the keyframe that is shown first while scrubbing.
+MailboxFrame = namedtuple("MailboxFrame", ["sequence", "frame_no", "pts",
+                                           "timestamp", "frame", "preview"])
+
+
+class FrameMailbox(object):
+    """Holds the most recent video frame of a decoder, for render loops that
+    poll for new frames instead of receiving them through a callback.
+
+    The decoder posts each frame it renders, which replaces the previous one.
+    A render loop remembers the sequence number of the last frame it
+    presented, and asks for a frame that is newer than that::
+
+        sequence = 0
+        while running:
+            latest = decoder.mailbox.wait(sequence, timeout=0.05)
+            if not latest is None:
+                sequence = latest.sequence
+                upload_texture(latest.frame)
+            handle_events()
+
+    poll() does not take a lock, so it can be called on every iteration of a
+    render loop. The posted frame is not copied, and the decoder never writes
+    into a frame after it has been posted (unless a FramePool is used, whose
+    buffers are reused once they are released or after a number of
+    generations).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = None
+        self._sequence = 0
+        self._wakeups = 0
+
+    @property
+    def sequence(self):
+        """The sequence number of the most recently posted frame (0 if no
+        frame has been posted yet)."""
+        return self._sequence
+
+    def post(self, frame, frame_no, pts, preview=False):
+        """Replaces the frame in the mailbox and wakes up the threads that
+        wait for it. This is called by the decoder.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+                The video frame.
+        frame_no : int
+                The number of the frame.
+        pts : float
+                The position of the frame in the media in seconds.
+        preview : bool, optional
+                Whether the frame is a preview of the requested frame (see
+                Decoder.scrub()) (default=False).
+        """
+        with self._condition:
+            self._sequence += 1
+            self._latest = MailboxFrame(self._sequence, frame_no, pts,
+                                        time.perf_counter(), frame, preview)
+            self._condition.notify_all()
+
+    def poll(self, after=0):
+        """Returns the most recent frame if it is newer than the frame with
+        sequence number after, without blocking or locking.
+
+        Parameters
+        ----------
+        after : int, optional
+                The sequence number of the last frame that was retrieved
+                (default=0).
+
+        Returns
+        -------
+        MailboxFrame or None
+                A named tuple (sequence, frame_no, pts, timestamp, frame,
+                preview), or None if there is no newer frame.
+        """
+        # The tuple is replaced as a whole, so reading it is atomic
+        latest = self._latest
+        if latest is None or latest.sequence <= after:
+            return None
+        return latest
+
+    def wait(self, after=0, timeout=None):
+        """Waits until a frame that is newer than the frame with sequence
+        number after is available, and returns it.
+
+        Parameters
+        ----------
+        after : int, optional
+                The sequence number of the last frame that was retrieved
+                (default=0).
+        timeout : float, optional
+                The maximum time to wait in seconds. If None, waits until a
+                frame arrives or wake() is called (default=None).
+
+        Returns
+        -------
+        MailboxFrame or None
+                The newer frame, or None if the wait timed out or was
+                interrupted by wake().
+        """
+        latest = self.poll(after)
+        if not latest is None:
+            return latest
+        with self._condition:
+            wakeups = self._wakeups
+            self._condition.wait_for(
+                lambda: self._wakeups != wakeups or
+                not self.poll(after) is None,
+                timeout,
+            )
+        return self.poll(after)
+
+    def wake(self):
+        """Makes the threads that are waiting for a frame return, for instance
+        because the playback has stopped."""
+        with self._condition:
+            self._wakeups += 1
+            self._condition.notify_all()
+
+    def clear(self):
+        """Removes the frame from the mailbox. The sequence numbers keep
+        increasing, so a render loop does not need to reset its count."""
+        with self._condition:
+            self._latest = None
@@ -0,0 +1,158 @@
+"""Hooks that are called at the boundaries of the stages of the decoding
+pipeline, to trace or profile playback without patching the library.
+
+A hook is a callable that is called when a stage starts and when it ends,
+with the following arguments:
+
+- phase (str): ``"start"`` or ``"end"``
+- stage (str): the name of the stage, see `stages`
+- frame_no (int or None): the frame number of the decoder's clock, or None
+  if the stage is not tied to a decoder
+- timestamp (float): the time of the event, as returned by
+  time.perf_counter()
+- source (object): the Decoder (or, for ``"audio_get"``, the AudioQueue)
+  that performs the stage
+
+For example, to print how long decoding each frame takes::
+
+    from mediadecoder import profiling
+
+    def hook(phase, stage, frame_no, timestamp, source):
+        ...
+
+    profiling.add_hook(hook)
+
+The hooks are called from the thread that performs the stage, so they should
+be thread-safe and quick. When no hook is installed, the only cost at each
+boundary is checking whether the list of hooks is empty.
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+START = "start"
+END = "end"
+
+# The stages that are reported
+stages = (
+    "load_media",       # Loading a media file (Decoder.load_media())
+    "decode_frame",     # Decoding a video frame
+    "render_callback",  # Calling the video render callback with a frame
+    "audio_decode",     # Extracting an audio chunk from the stream
+    "audio_put",        # Placing an audio chunk in the audio queue
+    "audio_get",        # Reading samples from the audio queue
+)
+
+# The installed hooks. The pipeline only checks whether this list is empty, so
+# it should only be changed through add_hook() and remove_hook().
+hooks = []
+
+
+def add_hook(hook):
+    """Installs a hook that is called at the start and end of each stage.
+
+    Parameters
+    ----------
+    hook : callable
+            The function to call with (phase, stage, frame_no, timestamp,
+            source).
+
+    Returns
+    -------
+    callable
+            The hook, so this function can be used as a decorator.
+    """
+    if not callable(hook):
+        raise TypeError("The hook is not a function")
+    if not hook in hooks:
+        hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """Removes a hook that was installed with add_hook(). Does nothing if the
+    hook is not installed."""
+    if hook in hooks:
+        hooks.remove(hook)
+
+
+def emit(phase, stage, frame_no=None, source=None):
+    """Calls the installed hooks. An exception raised by a hook is logged, so
+    that it does not interrupt playback."""
+    timestamp = time.perf_counter()
+    for hook in list(hooks):
+        try:
+            hook(phase, stage, frame_no, timestamp, source)
+        except Exception:
+            logger.exception("Error in profiling hook {!r}".format(hook))
+
+
+class StageTimer(object):
+    """A hook that collects the durations of the stages. Install it with
+    add_hook(), or use it as a context manager::
+
+        with StageTimer() as timer:
+            decoder.play()
+            ...
+        print(timer.summary())
+    """
+
+    def __init__(self, maxlen=None):
+        """Constructor.
+
+        Parameters
+        ----------
+        maxlen : int, optional
+                The maximum number of durations to keep per stage. The oldest
+                are discarded first. If None, all durations are kept
+                (default=None).
+        """
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._started = {}
+        self.durations = {}
+
+    def __call__(self, phase, stage, frame_no, timestamp, source):
+        # Stages can run in several threads at once
+        key = (stage, threading.get_ident(), id(source))
+        if phase == START:
+            self._started[key] = timestamp
+            return
+        start = self._started.pop(key, None)
+        if start is None:
+            return
+        with self._lock:
+            durations = self.durations.setdefault(stage, [])
+            durations.append(timestamp - start)
+            if not self.maxlen is None and len(durations) > self.maxlen:
+                del durations[0]
+
+    def summary(self):
+        """Summarizes the durations per stage.
+
+        Returns
+        -------
+        dict
+                stage -> dict with the count, and the mean and max durations in
+                seconds.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "count": len(durations),
+                    "mean": sum(durations) / len(durations),
+                    "max": max(durations),
+                }
+                for stage, durations in self.durations.items()
+                if durations
+            }
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_hook(self)
@@ -0,0 +1,195 @@
+# Python 3 compatibility
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+import time
+import threading
+import logging
+
+from .states import *
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler(object):
+    """Drives the playback of many decoders from a single thread.
+
+    Normally, every playing decoder runs its own render and audio threads that
+    poll the clock every few milliseconds. Decoders that are created with a
+    scheduler instead are serviced by the scheduler's thread, which keeps a
+    priority queue of the moments at which each decoder needs attention (its
+    next video frame, or refilling its audio buffer) and sleeps until the
+    earliest one. This allows a single process to play many small videos at
+    once, such as a wall of preview tiles.
+
+    The thread is started when the first decoder starts playing and ends when
+    no decoder is playing anymore.
+
+    Example::
+
+        scheduler = Scheduler()
+        decoders = [Decoder(f, videorenderfunc=draw, scheduler=scheduler)
+                    for f in files]
+        for decoder in decoders:
+            decoder.play()
+    """
+
+    def __init__(self, audio_interval=0.01, paused_interval=0.02):
+        """Constructor.
+
+        Parameters
+        ----------
+        audio_interval : float, optional
+                The maximum time in seconds between two refills of a decoder's
+                audio buffer (default=0.01).
+        paused_interval : float, optional
+                The interval in seconds at which paused decoders are checked,
+                for instance to show the new frame after a seek
+                (default=0.02).
+        """
+        self.audio_interval = audio_interval
+        self.paused_interval = paused_interval
+        self._queue = []
+        self._scheduled = set()
+        # Tie breaker for decoders that are due at the same time
+        self._counter = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        # The decoder that is being serviced
+        self._current = None
+
+    @property
+    def decoders(self):
+        """The decoders that are currently serviced by the scheduler."""
+        with self._condition:
+            return tuple(self._scheduled)
+
+    @property
+    def running(self):
+        """Whether the scheduler thread is running."""
+        return not self._thread is None
+
+    def add(self, decoder):
+        """Starts servicing a decoder. This is called by Decoder.play(), so it
+        does not need to be called directly.
+
+        Parameters
+        ----------
+        decoder : Decoder
+                The decoder to service. It should already be playing.
+        """
+        with self._condition:
+            if decoder in self._scheduled:
+                return
+            self._scheduled.add(decoder)
+            self.__push(time.time(), decoder)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.__run)
+                self._thread.start()
+            self._condition.notify()
+
+    def remove(self, decoder):
+        """Stops servicing a decoder. If the decoder is being serviced at the
+        moment, this waits until that is finished. This is called by
+        Decoder.stop(), so it does not need to be called directly.
+
+        Parameters
+        ----------
+        decoder : Decoder
+                The decoder to stop servicing.
+        """
+        with self._condition:
+            while self._current is decoder and \
+                    not self._thread is threading.current_thread():
+                self._condition.wait()
+            if not decoder in self._scheduled:
+                return
+            self._scheduled.discard(decoder)
+            self._queue = [entry for entry in self._queue
+                           if not entry[2] is decoder]
+            heapq.heapify(self._queue)
+            self._condition.notify_all()
+
+    def __push(self, deadline, decoder):
+        """Adds an entry to the queue. Should be called with the lock held."""
+        self._counter += 1
+        heapq.heappush(self._queue, (deadline, self._counter, decoder))
+
+    def __next_deadline(self, decoder):
+        """Determines when the decoder needs to be serviced again."""
+        now = time.time()
+        if decoder.status != PLAYING:
+            return now + self.paused_interval
+        # Time until the next video frame (or audio chunk in audio-only mode)
+        frame_interval = decoder.frame_interval
+        playtime = decoder.current_playtime
+        next_frame = (int(playtime / frame_interval) + 1) * frame_interval
+        deadline = now + max(0.0, next_frame - playtime)
+        if decoder.audioformat:
+            deadline = min(deadline, now + self.audio_interval)
+        return deadline
+
+    def __service(self, decoder):
+        """Renders the decoder's video frame if one is due and fills its
+        audio buffer.
+
+        Returns
+        -------
+        bool
+                False if the decoder has stopped playing.
+        """
+        try:
+            if not decoder._render_step():
+                return False
+            if decoder.audioformat:
+                # Fill the audio buffer until it has reached its latency
+                while decoder._audio_step(block=False):
+                    pass
+        except Exception as e:
+            logger.error("Error while servicing {}: {}".format(decoder, e))
+            decoder.stop()
+            return False
+        return True
+
+    def __run(self):
+        """Main loop of the scheduler. Do not call directly, but only as the
+        target of a thread."""
+        logger.debug("Started scheduler.")
+        while True:
+            with self._condition:
+                if not self._queue:
+                    self._thread = None
+                    break
+                deadline, _, decoder = self._queue[0]
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    # Sleep until the first deadline, or until a decoder is
+                    # added that may be due earlier
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._queue)
+                self._current = decoder
+
+            active = self.__service(decoder)
+
+            with self._condition:
+                self._current = None
+                self._condition.notify_all()
+                if not decoder in self._scheduled:
+                    # The decoder has been removed while it was serviced
+                    continue
+                # The decoder may have been restarted in the meantime
+                if active or decoder.status in [PLAYING, PAUSED]:
+                    self.__push(self.__next_deadline(decoder), decoder)
+                else:
+                    self._scheduled.discard(decoder)
+                    decoder._clock.stop()
+                    logger.debug("Scheduler stopped servicing {}".format(decoder))
+        logger.debug("Scheduler stopped.")
+
+    def __repr__(self):
+        """Create a string representation for when print() is called."""
+        return "Scheduler [{} decoders]".format(len(self._scheduled))
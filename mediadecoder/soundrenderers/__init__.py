@@ -1,18 +1,146 @@
-import warnings
+"""Sound renderers that play (or otherwise consume) the audio supplied by
+Decoder.
 
-try:
-    from .pyaudiorenderer import SoundrendererPyAudio
-except Exception as e:
-    warnings.warn("Could not import pyaudio sound renderer: {}".format(e))
+The renderers are only imported when they are first used, so importing this
+package does not pull in any sound library. A renderer class can be accessed
+as an attribute of this package (e.g. ``soundrenderers.SoundrendererPyAudio``),
+or looked up by name::
 
-try:
-    from .pygamerenderer import SoundrendererPygame
-except Exception as e:
-    warnings.warn("Could not import pygame sound renderer: {}".format(e))
+    from mediadecoder import soundrenderers
+    renderer = soundrenderers.get_renderer("sounddevice")(decoder.audioformat)
+
+Other packages can add renderers with register_renderer(), or by declaring an
+entry point in the ``mediadecoder.soundrenderers`` group that refers to the
+renderer class, for instance in pyproject.toml::
+
+    [project.entry-points."mediadecoder.soundrenderers"]
+    jack = "mypackage.jackrenderer:SoundrendererJack"
+"""
+
+import importlib
 
 try:
-    from .sounddevicerenderer import SoundrendererSounddevice
-except Exception as e:
-    warnings.warn("Could not import sounddevice sound renderer: {}".format(e))
+    from importlib.metadata import entry_points
+except ImportError:
+    entry_points = None
+
+# Entry point group in which other packages can register sound renderers
+entry_point_group = "mediadecoder.soundrenderers"
+
+# The built-in sound renderers: name -> (module, class name)
+_builtin_renderers = {
+    "pyaudio": (".pyaudiorenderer", "SoundrendererPyAudio"),
+    "pygame": (".pygamerenderer", "SoundrendererPygame"),
+    "sounddevice": (".sounddevicerenderer", "SoundrendererSounddevice"),
+    "null": (".nullrenderer", "SoundrendererNull"),
+    "wave": (".waverenderer", "SoundrendererWave"),
+}
+
+# Renderers added with register_renderer(): name -> class or import path
+_registered_renderers = {}
+
+__all__ = [
+    "SoundrendererPygame",
+    "SoundrendererPyAudio",
+    "SoundrendererSounddevice",
+    "SoundrendererNull",
+    "SoundrendererWave",
+    "available_renderers",
+    "get_renderer",
+    "register_renderer",
+]
+
+
+def register_renderer(name, renderer):
+    """Makes a sound renderer available under name. Registered renderers take
+    precedence over entry points and built-in renderers with the same name.
+
+    Parameters
+    ----------
+    name : str
+            The name under which the renderer can be retrieved.
+    renderer : class or str
+            The renderer class, or its import path in the form
+            'package.module:ClassName' so it is only imported when used.
+    """
+    _registered_renderers[name] = renderer
+
+
+def available_renderers():
+    """Returns the names of all known sound renderers. This does not import
+    the renderers, so it does not check whether their sound libraries are
+    installed.
+
+    Returns
+    -------
+    list of str
+    """
+    names = set(_builtin_renderers)
+    names.update(_renderer_entry_points())
+    names.update(_registered_renderers)
+    return sorted(names)
+
+
+def get_renderer(name):
+    """Imports the sound renderer with the specified name and returns its
+    class. Only the module of this renderer is imported.
+
+    Parameters
+    ----------
+    name : str
+            The name of the renderer, e.g. 'pyaudio' or 'sounddevice'. See
+            available_renderers().
+
+    Raises
+    ------
+    ValueError
+            If no renderer with this name is known.
+    ImportError
+            If the renderer could not be imported.
+    """
+    if name in _registered_renderers:
+        renderer = _registered_renderers[name]
+        if isinstance(renderer, str):
+            renderer = _import_path(renderer)
+        return renderer
+    entry_point = _renderer_entry_points().get(name)
+    if not entry_point is None:
+        return entry_point.load()
+    if name in _builtin_renderers:
+        module, classname = _builtin_renderers[name]
+        return getattr(importlib.import_module(module, __name__), classname)
+    raise ValueError("Unknown sound renderer: {}. Available are: {}".format(
+        name, ", ".join(available_renderers())))
+
+
+def _import_path(path):
+    """Imports the object that is referred to by 'package.module:name'."""
+    module, _, attribute = path.partition(":")
+    obj = importlib.import_module(module)
+    for part in attribute.split(".") if attribute else []:
+        obj = getattr(obj, part)
+    return obj
+
+
+_entry_point_cache = None
+
+
+def _renderer_entry_points():
+    """Returns the renderers that are declared as entry points, as a
+    dictionary of name -> entry point. The entry points are only looked up
+    once."""
+    global _entry_point_cache
+    if _entry_point_cache is None:
+        _entry_point_cache = {}
+        if not entry_points is None:
+            for entry_point in entry_points(group=entry_point_group):
+                _entry_point_cache[entry_point.name] = entry_point
+    return _entry_point_cache
+
 
-__all__ = ["SoundrendererPygame", "SoundrendererPyAudio", "SoundrendererSounddevice"]
+def __getattr__(name):
+    """Imports the built-in renderer classes when they are first accessed."""
+    for module, classname in _builtin_renderers.values():
+        if classname == name:
+            return getattr(importlib.import_module(module, __name__), classname)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
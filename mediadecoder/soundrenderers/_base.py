@@ -1,23 +1,393 @@
 try:
     # Python 3
-    from queue import Queue, Empty
+    from queue import Queue, Empty, Full
 except:
     # Python 2
-    from Queue import Queue, Empty
+    from Queue import Queue, Empty, Full
+
+import math
+import time
+
+import numpy as np
+
+from .. import profiling
+
+# Interval in seconds at which blocking puts and gets check the buffer again
+poll_interval = 0.002
+
+
+def sample_dtype(audioformat):
+    """Returns the data type of the samples described by audioformat.
+
+    Parameters
+    ----------
+    audioformat : dict
+            A dictionary containing the properties of the audiostream. If it
+            has no 'dtype' field, signed integer samples of 'nbytes' bytes are
+            assumed.
+    """
+    if "dtype" in audioformat:
+        return audioformat["dtype"]
+    return "int{}".format(8 * audioformat["nbytes"])
+
+
+class RingBuffer(object):
+    """Single-producer/single-consumer ring buffer of preallocated audio
+    samples.
+
+    The producer (the decoder) only advances the write position and the
+    consumer (a sound renderer) only advances the read position. A position is
+    only advanced after the samples have been copied, so neither side needs a
+    lock and no memory is allocated while reading or writing.
+    """
+
+    def __init__(self, capacity, nchannels, dtype):
+        """Constructor.
+
+        Parameters
+        ----------
+        capacity : int
+                The number of samples (per channel) the buffer can hold.
+        nchannels : int
+                The number of audio channels.
+        dtype : str or numpy.dtype
+                The data type of the samples.
+        """
+        if capacity < 1:
+            raise ValueError("capacity needs to be at least 1")
+        self.capacity = int(capacity)
+        self.nchannels = nchannels
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros((self.capacity, nchannels), dtype=self.dtype)
+        # Total number of samples written and read. Only the producer changes
+        # the first and only the consumer changes the second.
+        self._write_pos = 0
+        self._read_pos = 0
+        # Write position up to which the consumer should discard the samples
+        # (see flush()). Only the producer changes it.
+        self._flush_pos = 0
+
+    @property
+    def available(self):
+        """The number of samples that can be read."""
+        return self._write_pos - self._read_pos
+
+    @property
+    def space(self):
+        """The number of samples that can be written."""
+        return self.capacity - self.available
+
+    def write(self, samples):
+        """Copies samples into the buffer. Should only be called by the
+        producer.
+
+        Parameters
+        ----------
+        samples : numpy.ndarray
+                Array of shape (n, nchannels). Samples of a different data type
+                are converted while they are copied.
+
+        Returns
+        -------
+        bool
+                False if there was not enough space to write all samples, in
+                which case nothing was written.
+        """
+        n = len(samples)
+        if n > self.space:
+            return False
+        start = self._write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < n:
+            self._data[:n - first] = samples[first:]
+        # Only publish the samples once they have been copied
+        self._write_pos += n
+        return True
+
+    def flush(self):
+        """Requests that the samples that have been written so far are
+        discarded, for instance because playback continues at another
+        position. Should only be called by the producer. The consumer discards
+        the samples on its next read, so the buffer remains single-producer
+        and single-consumer."""
+        self._flush_pos = self._write_pos
+
+    def _apply_flush(self):
+        """Discards the samples of a flush() request. Called by the
+        consumer."""
+        flush_pos = self._flush_pos
+        if flush_pos > self._read_pos:
+            self._read_pos = flush_pos
+
+    def read_into(self, out):
+        """Copies as many samples as are available, up to len(out), into out.
+        Should only be called by the consumer.
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+                Array of shape (n, nchannels) to copy the samples into.
+
+        Returns
+        -------
+        int
+                The number of samples that were copied into out.
+        """
+        self._apply_flush()
+        n = min(len(out), self.available)
+        start = self._read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        if first < n:
+            out[first:n] = self._data[:n - first]
+        # Only release the space once the samples have been copied
+        self._read_pos += n
+        return n
+
+
+class AudioQueue(RingBuffer):
+    """Buffer of audio chunks whose length is determined by a target latency
+    instead of a fixed number of chunks.
+
+    The samples are stored in a preallocated ring buffer, so callback based
+    sound renderers can read any number of samples from it with read_into()
+    without locking or allocating memory. Thread based sound renderers can
+    retrieve whole chunks with the queue.Queue-like get().
+
+    When the consumer finds the buffer empty while audio is streaming (an
+    underrun), the allowed latency is increased, up to `max_latency`. After
+    a period without underruns, it is gradually decreased to the target
+    latency again.
+    """
+
+    def __init__(self, fps, buffersize, nchannels=2, dtype="int16", latency=100,
+                 max_latency=1000, stable_period=5.0):
+        """Constructor.
+
+        Parameters
+        ----------
+        fps : int
+                The sample rate of the audio stream.
+        buffersize : int
+                The (maximum) number of samples per audio chunk.
+        nchannels : int, optional
+                The number of audio channels (default=2).
+        dtype : str or numpy.dtype, optional
+                The data type of the samples (default='int16').
+        latency : float, optional
+                The target latency (i.e. the duration of audio that is kept
+                buffered) in milliseconds (default=100).
+        max_latency : float, optional
+                The latency in milliseconds up to which the buffer may grow when
+                underruns occur (default=1000).
+        stable_period : float, optional
+                The duration in seconds of audio that needs to be consumed
+                without underruns before the latency is decreased again
+                (default=5.0).
+        """
+        if latency <= 0:
+            raise ValueError("latency needs to be greater than 0")
+        self.fps = fps
+        self.buffersize = buffersize
+        self.target_latency = float(latency)
+        self.max_latency = max(float(max_latency), self.target_latency)
+        self.stable_period = stable_period
+
+        self._latency = self.target_latency
+        self._fill_limit = self.__samples_for(self._latency)
+        self._underruns = 0
+        self._stable_samples = 0
+        self._primed = False
+        RingBuffer.__init__(self, self.__samples_for(self.max_latency),
+                            nchannels, dtype)
+
+    @property
+    def latency(self):
+        """The currently allowed latency in milliseconds."""
+        return self._latency
+
+    @property
+    def buffered_duration(self):
+        """The duration in seconds of the audio that is currently buffered."""
+        return self.available / float(self.fps)
+
+    @property
+    def underruns(self):
+        """The number of times the buffer ran empty while audio was
+        streaming."""
+        return self._underruns
+
+    @property
+    def streaming(self):
+        """Whether the producer is supplying audio, i.e. whether running out
+        of samples would be an underrun."""
+        return self._primed
+
+    def suspend(self):
+        """Indicates that the producer has (temporarily) stopped supplying
+        chunks, for instance because playback was paused or the end of the
+        stream was reached. An empty buffer is then not counted as an underrun,
+        until new chunks are put into the buffer."""
+        self._primed = False
+
+    def qsize(self):
+        """The approximate number of chunks in the buffer."""
+        return int(math.ceil(self.available / float(self.buffersize)))
+
+    def empty(self):
+        """True if the buffer is empty."""
+        return self.available == 0
+
+    def full(self):
+        """True if the buffer has reached the allowed latency."""
+        return self.available >= self._fill_limit
+
+    def put(self, chunk, block=True, timeout=None):
+        """Copies a chunk into the buffer. See queue.Queue.put.
+
+        Raises
+        ------
+        queue.Full
+                If the chunk does not fit within the allowed latency.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.__accepts(len(chunk)) or not self.write(chunk):
+            if not block:
+                raise Full
+            if deadline is None:
+                time.sleep(poll_interval)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise Full
+                time.sleep(min(poll_interval, remaining))
+        self._primed = True
+
+    def put_nowait(self, chunk):
+        """Equivalent to put(chunk, False)."""
+        return self.put(chunk, False)
+
+    def get(self, block=True, timeout=None):
+        """Removes and returns a chunk of at most buffersize samples from the
+        buffer. See queue.Queue.get. This allocates a new array for each
+        chunk, so callback based renderers should use read_into() instead.
+
+        Raises
+        ------
+        queue.Empty
+                If no samples are available.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        self._apply_flush()
+        while self.available == 0:
+            if self._primed:
+                self.__underrun()
+            if not block:
+                raise Empty
+            if deadline is None:
+                time.sleep(poll_interval)
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise Empty
+                time.sleep(min(poll_interval, remaining))
+        chunk = np.empty((min(self.buffersize, self.available), self.nchannels),
+                         dtype=self.dtype)
+        self.read_into(chunk)
+        return chunk
+
+    def get_nowait(self):
+        """Equivalent to get(False)."""
+        return self.get(False)
+
+    def read_into(self, out):
+        """Copies as many samples as are available, up to len(out), into out.
+        See RingBuffer.read_into. Reading fewer samples than requested while
+        audio is streaming counts as an underrun."""
+        profile = bool(profiling.hooks)
+        if profile:
+            profiling.emit(profiling.START, "audio_get", None, self)
+        n = RingBuffer.read_into(self, out)
+        if profile:
+            profiling.emit(profiling.END, "audio_get", None, self)
+        if n < len(out) and self._primed:
+            self.__underrun()
+        elif self._latency > self.target_latency:
+            self._stable_samples += n
+            if self._stable_samples >= self.stable_period * self.fps:
+                self._stable_samples = 0
+                self.__set_latency(max(self.target_latency, self._latency / 1.5))
+        return n
+
+    def __samples_for(self, latency):
+        """The number of samples that corresponds to latency, but at least one
+        chunk."""
+        return max(self.buffersize, int(math.ceil(latency * self.fps / 1000.0)))
+
+    def __accepts(self, n):
+        """Whether n samples can be added without exceeding the allowed
+        latency. An empty buffer always accepts a chunk."""
+        available = self.available
+        return available == 0 or available + n <= self._fill_limit
+
+    def __set_latency(self, latency):
+        """Sets the allowed latency."""
+        self._latency = latency
+        self._fill_limit = self.__samples_for(latency)
+
+    def __underrun(self):
+        """Registers an underrun and increases the allowed latency."""
+        self._primed = False
+        self._underruns += 1
+        self._stable_samples = 0
+        if self._latency < self.max_latency:
+            self.__set_latency(min(self.max_latency, 1.5 * self._latency))
 
 
 class SoundRenderer(object):
     """Base class for sound renderers."""
 
+    _underruns = 0
+
     def __init__(self, audioformat, queue=None):
         raise NotImplementedError(
             "This class should be subclassed and not be instantiated directly."
         )
 
+    @property
+    def underruns(self):
+        """The number of times the renderer had to output silence because the
+        decoder did not supply audio in time."""
+        return self._underruns
+
+    def _fill(self, out):
+        """Fills out with as many samples as are available and pads the rest
+        with silence, without ever blocking. This is meant for use in audio
+        callbacks.
+
+        Parameters
+        ----------
+        out : numpy.ndarray
+                Array of shape (n, nchannels) to fill.
+
+        Returns
+        -------
+        int
+                The number of samples that were read from the queue.
+        """
+        streaming = getattr(self._queue, "streaming", True)
+        n = self._queue.read_into(out)
+        if n < len(out):
+            out[n:].fill(0)
+            if streaming:
+                self._underruns += 1
+        return n
+
     @property
     def queue(self):
         """The audiobuffer object. It should be a thread-safe queue.Queue
-        object."""
+        object, or a RingBuffer such as the decoder's AudioQueue."""
         return self._queue
 
     @queue.setter
@@ -26,9 +396,9 @@ class SoundRenderer(object):
 
         Parameters
         ----------
-        value : queue.Queue
+        value : queue.Queue or RingBuffer
                 The buffer from which audioframes are received.
         """
-        if not isinstance(value, Queue):
-            raise TypeError("queue is not a Queue object")
+        if not isinstance(value, (Queue, RingBuffer)):
+            raise TypeError("queue is not a Queue or RingBuffer object")
         self._queue = value
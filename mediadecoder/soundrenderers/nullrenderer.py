@@ -0,0 +1,167 @@
+import time
+import threading
+
+import numpy as np
+
+from ._base import SoundRenderer, sample_dtype
+
+# Interval in seconds at which the buffer is checked again when it is empty
+poll_interval = 0.002
+
+
+class SoundrendererNull(threading.Thread, SoundRenderer):
+    """Consumes audio without playing it, which allows the audio pipeline to
+    be run and measured without any sound hardware.
+
+    In real-time mode, the renderer behaves like a sound device: every block
+    of samples is read at the moment a device would need it, and blocks that
+    cannot be filled completely are padded with silence. Otherwise, the audio
+    is consumed as fast as the decoder can supply it.
+    """
+
+    def __init__(self, audioformat, queue=None, realtime=True, blocksize=None):
+        """Constructor.
+        Creates a null sound renderer.
+
+        Parameters
+        ----------
+        audioformat : dict
+                A dictionary containing the properties of the audiostream
+        queue : AudioQueue, optional
+                A ring buffer into which the audio frames are written by the
+                decoder (default=None).
+        realtime : bool, optional
+                Consume the audio at the rate at which it would be played,
+                instead of as fast as possible (default=True).
+        blocksize : int, optional
+                The number of frames that is read at once. If None, the
+                decoder's buffersize is used (default=None).
+        """
+        # Init thread
+        super(SoundrendererNull, self).__init__()
+
+        if not queue is None:
+            self.queue = queue
+
+        self.realtime = realtime
+        self._fps = audioformat["fps"]
+        if blocksize is None:
+            blocksize = audioformat["buffersize"]
+        self._block = np.zeros(
+            (blocksize, audioformat["nchannels"]), dtype=sample_dtype(audioformat)
+        )
+
+        self._blocks = 0
+        self._frames = 0
+        self._silent_frames = 0
+        self._underruns = 0
+        self._total_read_time = 0.0
+        self._max_read_time = 0.0
+        self._max_lateness = 0.0
+        self._start_time = None
+        self._stop_time = None
+
+    @property
+    def stats(self):
+        """Timing statistics of the consumed audio, as a dictionary with the
+        fields
+
+        :realtime: whether the audio was consumed in real time.
+        :blocks: the number of blocks that were rendered.
+        :frames: the number of frames received from the decoder.
+        :silent_frames: the number of frames padded with silence (real-time
+            mode only).
+        :underruns: the number of times a block could not be filled
+            completely while the decoder was supplying audio (real-time mode
+            only).
+        :elapsed: the wall-clock time in seconds the renderer ran for.
+        :audio_duration: the duration in seconds of the received audio.
+        :speed: audio_duration divided by elapsed.
+        :mean_read_time: the mean time in seconds needed to read a block.
+        :max_read_time: the longest time in seconds needed to read a block.
+        :max_lateness: the largest delay in seconds with which a block was
+            read after it was due (real-time mode only).
+        """
+        if self._start_time is None:
+            elapsed = 0.0
+        elif self._stop_time is None:
+            elapsed = time.perf_counter() - self._start_time
+        else:
+            elapsed = self._stop_time - self._start_time
+        audio_duration = self._frames / float(self._fps)
+        return {
+            "realtime": self.realtime,
+            "blocks": self._blocks,
+            "frames": self._frames,
+            "silent_frames": self._silent_frames,
+            "underruns": self._underruns,
+            "elapsed": elapsed,
+            "audio_duration": audio_duration,
+            "speed": audio_duration / elapsed if elapsed else None,
+            "mean_read_time": (self._total_read_time / self._blocks
+                               if self._blocks else None),
+            "max_read_time": self._max_read_time,
+            "max_lateness": self._max_lateness,
+        }
+
+    def run(self):
+        """Main thread function."""
+        if not hasattr(self, "queue"):
+            raise RuntimeError("Audio queue is not intialized.")
+
+        blocksize = len(self._block)
+        block_duration = blocksize / float(self._fps)
+        self.keep_listening = True
+        self._start_time = time.perf_counter()
+        next_block_due = self._start_time
+
+        while self.keep_listening:
+            if self.realtime:
+                now = time.perf_counter()
+                if now < next_block_due:
+                    time.sleep(min(next_block_due - now, 0.01))
+                    continue
+                self._max_lateness = max(self._max_lateness, now - next_block_due)
+                next_block_due += block_duration
+
+            read_start = time.perf_counter()
+            if self.realtime:
+                # Like a sound device, never wait for the decoder
+                n = self._fill(self._block)
+            else:
+                # Only ask for the samples that are available, as draining the
+                # queue faster than the decoder fills it is not an underrun.
+                self.queue._apply_flush()
+                n = self.queue.read_into(self._block[:self.queue.available])
+            read_time = time.perf_counter() - read_start
+
+            if self.realtime:
+                self._silent_frames += blocksize - n
+                samples = self._block
+            elif n:
+                samples = self._block[:n]
+            else:
+                time.sleep(poll_interval)
+                continue
+
+            self._blocks += 1
+            self._frames += n
+            self._total_read_time += read_time
+            self._max_read_time = max(self._max_read_time, read_time)
+            self._render(samples)
+
+        self._stop_time = time.perf_counter()
+        self._finish()
+
+    def _render(self, samples):
+        """Renders a block of samples. Does nothing, but can be overridden by
+        subclasses."""
+        pass
+
+    def _finish(self):
+        """Performs cleanup after the last block has been rendered."""
+        pass
+
+    def close_stream(self):
+        """Stops consuming audio."""
+        self.keep_listening = False
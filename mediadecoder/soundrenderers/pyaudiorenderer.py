@@ -1,19 +1,21 @@
-try:
-    # Python 3
-    from queue import Queue, Empty
-except:
-    # Python 2
-    from Queue import Queue, Empty
+import numpy as np
 
-from ._base import SoundRenderer
+from ._base import SoundRenderer, sample_dtype
 
-queue_timeout = 0.01
+
+def _pyaudio_format(audioformat):
+    """Returns the pyaudio sample format that corresponds to audioformat."""
+    import pyaudio
+
+    if sample_dtype(audioformat) == "float32":
+        return pyaudio.paFloat32
+    return pyaudio.get_format_from_width(audioformat["nbytes"])
 
 
 class SoundrendererPyAudio(SoundRenderer):
     """Uses pyaudio to play sound"""
 
-    def __init__(self, audioformat, queue=None):
+    def __init__(self, audioformat, queue=None, frames_per_buffer=None):
         """Constructor.
         Creates a pyaudio sound renderer.
 
@@ -21,9 +23,15 @@ class SoundrendererPyAudio(SoundRenderer):
         ----------
         audioformat : dict
                 A dictionary containing the properties of the audiostream
-        queue : Queue.queue
-                A queue object which serves as a buffer on which the individual
-                audio frames are placed by the decoder.
+        queue : AudioQueue
+                A ring buffer into which the audio frames are written by the
+                decoder.
+        frames_per_buffer : int, optional
+                The number of frames per buffer the stream requests. This does
+                not need to match the decoder's buffersize, so small buffers
+                can be used for a low output latency. 0 lets PortAudio choose
+                the (possibly varying) buffer size. If None, the decoder's
+                buffersize is used (default=None).
         """
 
         global pyaudio
@@ -32,26 +40,50 @@ class SoundrendererPyAudio(SoundRenderer):
         if not queue is None:
             self.queue = queue
 
+        if frames_per_buffer is None:
+            frames_per_buffer = audioformat["buffersize"]
+
+        # Preallocated buffer that is handed to PortAudio in the callback
+        self._buffer = np.zeros(
+            (max(frames_per_buffer, audioformat["buffersize"]),
+             audioformat["nchannels"]),
+            dtype=sample_dtype(audioformat),
+        )
+
         self.pa = pyaudio.PyAudio()
         self.stream = self.pa.open(
             channels=audioformat["nchannels"],
             rate=audioformat["fps"],
-            frames_per_buffer=audioformat["buffersize"],
-            format=pyaudio.get_format_from_width(audioformat["nbytes"]),
+            frames_per_buffer=frames_per_buffer,
+            format=_pyaudio_format(audioformat),
             output=True,
             stream_callback=self.get_frame,
         )
         self.keep_listening = True
+        self._output_underflows = 0
+
+    @property
+    def output_underflows(self):
+        """The number of times PortAudio reported that the output underflowed,
+        i.e. that the callback did not deliver its samples in time."""
+        return self._output_underflows
 
     def get_frame(self, in_data, frame_count, time_info, status):
         """Callback function for the pyaudio stream. Don't use directly."""
-        while self.keep_listening:
-            try:
-                frame = self.queue.get(False, timeout=queue_timeout)
-                return (frame, pyaudio.paContinue)
-            except Empty:
-                pass
-        return (None, pyaudio.paComplete)
+        if frame_count > len(self._buffer):
+            # Only happens if PortAudio chooses the buffer size
+            self._buffer = np.zeros((frame_count, self._buffer.shape[1]),
+                                    dtype=self._buffer.dtype)
+        if not self.keep_listening:
+            return (None, pyaudio.paComplete)
+        if status & pyaudio.paOutputUnderflow:
+            self._output_underflows += 1
+
+        # Never wait for the decoder in the callback, but fill the buffer with
+        # silence if not enough samples are available.
+        frame = self._buffer[:frame_count]
+        self._fill(frame)
+        return (frame, pyaudio.paContinue)
 
     def start(self):
         """Initializes the stream."""
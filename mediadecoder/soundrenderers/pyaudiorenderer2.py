@@ -9,6 +9,7 @@ except:
     from Queue import Queue, Empty
 
 from ._base import SoundRenderer
+from .pyaudiorenderer import _pyaudio_format
 
 queue_timeout = 0.01
 
@@ -42,7 +43,7 @@ class SoundrendererPyAudio(threading.Thread, SoundRenderer):
             channels=audioformat["nchannels"],
             rate=audioformat["fps"],
             # frames_per_buffer = audioformat['buffersize']/2,
-            format=pyaudio.get_format_from_width(audioformat["nbytes"]),
+            format=_pyaudio_format(audioformat),
             output=True,
         )
 
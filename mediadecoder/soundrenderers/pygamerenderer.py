@@ -10,7 +10,9 @@ except:
     # Python 2
     from Queue import Queue, Empty
 
-from ._base import SoundRenderer
+import numpy as np
+
+from ._base import SoundRenderer, sample_dtype
 
 queue_timeout = 0.01
 
@@ -52,6 +54,9 @@ class SoundrendererPygame(threading.Thread, SoundRenderer):
         fps = audioformat["fps"]
         nchannels = audioformat["nchannels"]
         self._nbytes = nbytes = audioformat["nbytes"]
+        self._dtype = np.dtype(sample_dtype(audioformat))
+        self._nchannels = nchannels
+        self._buffersize = audioformat["buffersize"]
         if pygame_buffersize:
             buffersize = pygame_buffersize
         else:
@@ -74,8 +79,6 @@ class SoundrendererPygame(threading.Thread, SoundRenderer):
         global pygame
         import pygame
 
-        import numpy as np
-
         pygame_mixer_unsigned = pygame.mixer.get_init()[1] > 0
 
         if not hasattr(self, "queue"):
@@ -95,21 +98,7 @@ class SoundrendererPygame(threading.Thread, SoundRenderer):
             if chunk is None:
                 try:
                     frame = self.queue.get(timeout=queue_timeout)
-
-                    # Moviepy only supports 8, 16 and 32 bit signed integer.
-                    # Pygame also supports 8 and 16 bit unsigned integer, as
-                    # well as 32 bit floating point. In case the Pygame mixer
-                    # uses one of those formats, we need to convert each audio
-                    # frame to that on the fly.
-                    if pygame_mixer_unsigned:  # signed int --> unsigned int
-                        if self._nbytes == 1:
-                            frame = frame.astype(np.uint8) + 128
-                        if self._nbytes == 2:
-                            frame = frame.astype(np.uint16) + 32768
-                    if self._nbytes == 4:  # signed int --> float
-                        frame = (frame.astype(np.float32) /
-                                 np.iinfo(np.int32).max)
-
+                    frame = self.__convert(frame, pygame_mixer_unsigned)
                     chunk = pygame.sndarray.make_sound(frame)
                 except Empty:
                     continue
@@ -142,6 +131,39 @@ class SoundrendererPygame(threading.Thread, SoundRenderer):
             if self._own_mixer:
                 pygame.mixer.quit()
 
+    def __convert(self, frame, mixer_unsigned):
+        """Converts a frame to the format of the pygame mixer.
+
+        The decoder supplies 8, 16 and 32 bit signed integer or 32 bit floating
+        point samples. The Pygame mixer may instead use 8 and 16 bit unsigned
+        integer samples, and always uses floating point for 32 bit samples. In
+        those cases, each frame is converted on the fly into a preallocated
+        buffer."""
+        if mixer_unsigned and self._nbytes in (1, 2):
+            # signed int --> unsigned int, which comes down to flipping the
+            # sign bit
+            utype = np.dtype("uint{}".format(8 * self._nbytes))
+            out = self.__conversion_buffer(len(frame), utype)
+            np.bitwise_xor(frame.view(utype), 1 << (8 * self._nbytes - 1),
+                           out=out)
+            return out
+        if self._nbytes == 4 and self._dtype.kind == "i":
+            # signed int --> float
+            out = self.__conversion_buffer(len(frame), np.float32)
+            np.multiply(frame, 1.0 / np.iinfo(np.int32).max, out=out,
+                        casting="unsafe")
+            return out
+        return frame
+
+    def __conversion_buffer(self, nframes, dtype):
+        """Returns a view of nframes on the preallocated conversion buffer."""
+        buffer = getattr(self, "_conversion_buffer", None)
+        if buffer is None or buffer.dtype != dtype or len(buffer) < nframes:
+            buffer = np.empty((max(nframes, self._buffersize), self._nchannels),
+                              dtype=dtype)
+            self._conversion_buffer = buffer
+        return buffer[:nframes]
+
     def close_stream(self):
         """Cleanup (done by pygame.quit() in main loop)"""
         self.keep_listening = False
@@ -1,29 +1,26 @@
-try:
-    # Python 3
-    from queue import Queue, Empty
-except:
-    # Python 2
-    from Queue import Queue, Empty
-
-from ._base import SoundRenderer
-
-queue_timeout = 0.01
+from ._base import SoundRenderer, sample_dtype
 
 
 class SoundrendererSounddevice(SoundRenderer):
     """Uses python-sounddevice to play sound"""
 
-    def __init__(self, audioformat, queue=None):
+    def __init__(self, audioformat, queue=None, blocksize=None):
         """Constructor.
-        Creates a pyaudio sound renderer.
+        Creates a sounddevice sound renderer.
 
         Parameters
         ----------
         audioformat : dict
                 A dictionary containing the properties of the audiostream
-        queue : Queue.queue
-                A queue object which serves as a buffer on which the individual
-                audio frames are placed by the decoder.
+        queue : AudioQueue
+                A ring buffer into which the audio frames are written by the
+                decoder.
+        blocksize : int, optional
+                The number of frames per block the device requests. This does
+                not need to match the decoder's buffersize, so small blocks
+                (e.g. 64 or 128 frames) can be used for a low output latency.
+                0 lets PortAudio choose the (possibly varying) block size. If
+                None, the decoder's buffersize is used (default=None).
         """
         global sd
         import sounddevice as sd
@@ -31,14 +28,24 @@ class SoundrendererSounddevice(SoundRenderer):
         if not queue is None:
             self.queue = queue
 
+        if blocksize is None:
+            blocksize = audioformat["buffersize"]
+
         self.stream = sd.OutputStream(
             channels=audioformat["nchannels"],
             samplerate=audioformat["fps"],
-            dtype="int{}".format(audioformat["nbytes"] * 8),
-            blocksize=audioformat["buffersize"],
+            dtype=sample_dtype(audioformat),
+            blocksize=blocksize,
             callback=self.get_frame,
         )
         self.keep_listening = True
+        self._output_underflows = 0
+
+    @property
+    def output_underflows(self):
+        """The number of times PortAudio reported that the output underflowed,
+        i.e. that the callback did not deliver its samples in time."""
+        return self._output_underflows
 
     def get_frame(self, outdata, frames, timedata, status):
         """Callback function for the audio stream. Don't use directly."""
@@ -46,16 +53,15 @@ class SoundrendererSounddevice(SoundRenderer):
         if not self.keep_listening:
             raise sd.CallbackStop
 
-        try:
-            chunk = self.queue.get_nowait()
-            # Check if the chunk contains the expected number of frames
-            # The callback function raises a ValueError otherwise.
-            if chunk.shape[0] == frames:
-                outdata[:] = chunk
-            else:
-                outdata.fill(0)
-        except Empty:
-            outdata.fill(0)
+        if status.output_underflow:
+            self._output_underflows += 1
+
+        # Copy the samples straight from the decoder's ring buffer into the
+        # output buffer, which requires neither locking nor allocation. The
+        # ring buffer is not divided in chunks, so any number of frames can be
+        # served, even if this spans several of the decoder's chunks. If not
+        # enough samples are available, the remainder is filled with silence.
+        self._fill(outdata)
 
     def start(self):
         """Initializes the stream."""
@@ -10,7 +10,7 @@ except:
     # Python 2
     from Queue import Queue, Empty
 
-from ._base import SoundRenderer
+from ._base import SoundRenderer, sample_dtype
 
 queue_timeout = 0.01
 
@@ -47,7 +47,7 @@ class SoundrendererSounddevice(threading.Thread, SoundRenderer):
         self.stream = sd.OutputStream(
             channels=audioformat["nchannels"],
             samplerate=audioformat["fps"],
-            dtype="int{}".format(audioformat["nbytes"] * 8),
+            dtype=sample_dtype(audioformat),
             blocksize=audioformat["buffersize"],
         )
 
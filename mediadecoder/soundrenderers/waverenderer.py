@@ -0,0 +1,73 @@
+import wave
+
+import numpy as np
+
+from .nullrenderer import SoundrendererNull
+
+
+class SoundrendererWave(SoundrendererNull):
+    """Writes the audio to a WAV file instead of playing it. Like
+    SoundrendererNull, it can consume the audio in real time or as fast as
+    possible, and keeps the same timing statistics."""
+
+    def __init__(self, audioformat, filename, queue=None, realtime=False,
+                 blocksize=None):
+        """Constructor.
+        Creates a sound renderer that writes to a WAV file.
+
+        Parameters
+        ----------
+        audioformat : dict
+                A dictionary containing the properties of the audiostream
+        filename : str
+                The path of the WAV file to write. Floating point audio is
+                written as 16 bit samples.
+        queue : AudioQueue, optional
+                A ring buffer into which the audio frames are written by the
+                decoder (default=None).
+        realtime : bool, optional
+                Consume the audio at the rate at which it would be played,
+                instead of as fast as possible (default=False).
+        blocksize : int, optional
+                The number of frames that is read at once. If None, the
+                decoder's buffersize is used (default=None).
+        """
+        super(SoundrendererWave, self).__init__(
+            audioformat, queue=queue, realtime=realtime, blocksize=blocksize
+        )
+
+        # WAV files store 8 bit samples as unsigned integers and do not
+        # support floating point samples (in the wave module), so these are
+        # converted into a preallocated buffer before they are written.
+        kind = self._block.dtype.kind
+        if kind == "f":
+            self._converted = np.empty(self._block.shape, dtype=np.int16)
+        elif self._block.dtype.itemsize == 1:
+            self._converted = np.empty(self._block.shape, dtype=np.uint8)
+        else:
+            self._converted = None
+        sampwidth = (self._converted if self._converted is not None
+                     else self._block).dtype.itemsize
+
+        self.filename = filename
+        self._wavefile = wave.open(filename, "wb")
+        self._wavefile.setnchannels(audioformat["nchannels"])
+        self._wavefile.setsampwidth(sampwidth)
+        self._wavefile.setframerate(audioformat["fps"])
+
+    def _render(self, samples):
+        """Writes a block of samples to the file."""
+        if self._converted is not None:
+            out = self._converted[:len(samples)]
+            if samples.dtype.kind == "f":
+                np.clip(samples, -1.0, 1.0, out=samples)
+                np.multiply(samples, 32767, out=out, casting="unsafe")
+            else:
+                # signed int --> unsigned int
+                np.bitwise_xor(samples.view(np.uint8), 0x80, out=out)
+            samples = out
+        self._wavefile.writeframes(samples)
+
+    def _finish(self):
+        """Closes the WAV file."""
+        self._wavefile.close()
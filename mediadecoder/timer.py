@@ -5,20 +5,33 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import time
-import threading
 
 from .states import *
 
-try:
-    from moviepy.tools import cvsecs  # MoviePy < 2.0.0
-except ImportError:
-    from moviepy.tools import convert_to_seconds as cvsecs  # MoviePy >= 2.0.0
+_cvsecs = None
+
+
+def cvsecs(value):
+    """Converts a time in any of the formats accepted by Timer.time to
+    seconds. MoviePy is only imported when the time is not simply a number,
+    which keeps importing this module cheap."""
+    global _cvsecs
+    if isinstance(value, (int, float)):
+        return value
+    if _cvsecs is None:
+        try:
+            from moviepy.tools import cvsecs as _cvsecs  # MoviePy < 2.0.0
+        except ImportError:
+            # MoviePy >= 2.0.0
+            from moviepy.tools import convert_to_seconds as _cvsecs
+    return _cvsecs(value)
 
 
 class Timer(object):
     """Timer serves as a video clock that is used to determine which frame needs to be
-    displayed at a specified time. the clock runs in its own separate thread.
-    Say you have an instance of Timer called ``clock``. The time can be polled by
+    displayed at a specified time. The time is calculated from the system
+    clock whenever it is polled, so the timer does not need a thread of its
+    own. Say you have an instance of Timer called ``clock``. The time can be polled by
     checking
 
     >> clock.time
@@ -27,9 +40,11 @@ class Timer(object):
 
     >> clock.current_frame.
 
+    A timer can follow the time of another (master) timer, so that several
+    videos with different frame rates can be driven by the same clock.
     """
 
-    def __init__(self, fps=None, max_duration=None):
+    def __init__(self, fps=None, max_duration=None, master=None):
         """Constructor.
 
         Parameters
@@ -38,7 +53,11 @@ class Timer(object):
                 The frames per second of the video for which this timer is created.
         max_duration : float, optional
                 The maximum time in seconds the timer should run for.
+        master : Timer, optional
+                A timer whose time is used instead of this timer's own. Setting
+                the time of this timer then sets the time of the master.
         """
+        self.master = master
         self.status = PAUSED
         self.max_duration = max_duration
         self.fps = fps
@@ -62,31 +81,14 @@ class Timer(object):
             self.status = RUNNING
 
     def start(self):
-        """Starts the clock from 0.
-        Uses a separate thread to handle the timing functionalities."""
-        if not hasattr(self, "thread") or not self.thread.is_alive():
-            self.thread = threading.Thread(target=self.__run)
-            self.status = RUNNING
+        """Starts the clock from 0."""
+        if self.status != RUNNING:
             self.reset()
-            self.thread.start()
+            self.interval_start = time.time()
+            self.status = RUNNING
         else:
             print("Clock already running!")
 
-    def __run(self):
-        """Internal function that is run in a separate thread. Do not call
-        directly."""
-        self.interval_start = time.time()
-        while self.status != STOPPED:
-            if self.status == RUNNING:
-                self.current_interval_duration = time.time() - self.interval_start
-
-            # If max_duration is set, stop the clock if it is reached
-            if self.max_duration and self.time > self.max_duration:
-                self.status == STOPPED
-
-            # One refresh per millisecond seems enough
-            time.sleep(0.001)
-
     def stop(self):
         """Stops the clock and resets the internal timers."""
         self.status = STOPPED
@@ -95,7 +97,12 @@ class Timer(object):
     @property
     def time(self):
         """The current time of the clock."""
-        return sum(self.previous_intervals) + self.current_interval_duration
+        if not self.master is None:
+            return self.master.time
+        current_interval_duration = self.current_interval_duration
+        if self.status == RUNNING:
+            current_interval_duration = time.time() - self.interval_start
+        return sum(self.previous_intervals) + current_interval_duration
 
     @time.setter
     def time(self, value):
@@ -113,9 +120,14 @@ class Timer(object):
             >>> '01:01:33.045' -> 3693.045
             >>> '01:01:33,5' #comma works too
         """
+        if not self.master is None:
+            self.master.time = value
+            return
         seconds = cvsecs(value)
         self.reset()
         self.previous_intervals.append(seconds)
+        # Count the running interval from now on
+        self.interval_start = time.time()
 
     @property
     def current_frame(self):
@@ -178,13 +190,13 @@ class Timer(object):
         TypeError
                 If max_duration is not a number.
         ValueError
-                If max_duration is smaller than 0.
+                If max_duration is not greater than 0.
         """
         if not value is None:
             if not type(value) in [float, int]:
                 raise TypeError("max_duration needs to be specified as a number")
-            if value < 1.0:
-                raise ValueError("max_duration needs to be greater than 1.0")
+            if value <= 0:
+                raise ValueError("max_duration needs to be greater than 0")
             value = float(value)
         self.__max_duration = value
 
@@ -12,9 +12,71 @@ from OpenGL.GL import *
 import numpy as np
 
 import mediadecoder  # For the state constants
+import mediadecoder.soundrenderers
 from mediadecoder.decoder import Decoder
 
 
+class PresentationStats:
+    """Aggregates the timings of the presentation loop, so that they can be
+    reported once per interval instead of for every frame."""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.summary = {}
+        self.__reset(time.perf_counter())
+
+    def __reset(self, now):
+        self._start = now
+        self._durations = {}
+        self._frames = 0
+        self._dropped = 0
+
+    def add(self, name, duration):
+        """Adds the duration (in seconds) of a step of the loop."""
+        self._durations.setdefault(name, []).append(duration)
+
+    def frame(self, dropped=0):
+        """Counts a presented frame, and the frames that were dropped before
+        it."""
+        self._frames += 1
+        self._dropped += dropped
+
+    def update(self):
+        """Summarizes the timings if the interval has passed.
+
+        Returns
+        -------
+        bool
+                True if a new summary is available.
+        """
+        now = time.perf_counter()
+        elapsed = now - self._start
+        if elapsed < self.interval:
+            return False
+        summary = {"fps": self._frames / elapsed, "dropped": self._dropped}
+        for name, durations in self._durations.items():
+            summary[name] = (
+                1000 * sum(durations) / len(durations),
+                1000 * max(durations),
+            )
+        self.summary = summary
+        self.__reset(now)
+        return True
+
+    def lines(self):
+        """The summary as lines of text."""
+        if not self.summary:
+            return ["Collecting statistics..."]
+        lines = [
+            "{fps:.1f} fps, {dropped} frames dropped".format(**self.summary)
+        ]
+        for name in ["upload", "draw", "flip"]:
+            if name in self.summary:
+                lines.append("{0}: {1:.2f} ms (max {2:.2f} ms)".format(
+                    name, *self.summary[name]))
+        return lines
+
+
 class VideoPlayer:
     """This is an example videoplayer that uses pygame+pyopengl to render a video.
     It uses the Decoder object to decode the video- and audiostream frame by frame.
@@ -23,7 +85,12 @@ class VideoPlayer:
     """
 
     def __init__(
-        self, dimensions, fullscreen=False, soundrenderer="pyaudio", loop=False
+        self,
+        dimensions,
+        fullscreen=False,
+        soundrenderer="pyaudio",
+        loop=False,
+        show_stats=False,
     ):
         """Constructor.
 
@@ -34,8 +101,14 @@ class VideoPlayer:
                 ratio is maintained.
         fullscreen : bool, optional
                 Indicates whether the video should be displayed in fullscreen.
-        soundrenderer : {'pyaudio','pygame'}
-                Designates which sound backend should render the sound.
+        soundrenderer : str
+                Designates which sound backend should render the sound (see
+                mediadecoder.soundrenderers.available_renderers()).
+        loop : bool, optional
+                Whether the video should be looped.
+        show_stats : bool, optional
+                Whether the presentation timings should be shown in an overlay.
+                This can be toggled with the i key.
         """
 
         pygame.init()
@@ -49,14 +122,23 @@ class VideoPlayer:
 
         self.soundrenderer = soundrenderer
         self.loop = loop
-        self.texUpdated = False
+        self.show_stats = show_stats
+        self.stats = PresentationStats()
+        # Window events after which the window needs to be redrawn
+        self.redraw_events = set(
+            getattr(pygame, name)
+            for name in ["VIDEOEXPOSE", "VIDEORESIZE", "ACTIVEEVENT", "WINDOWEXPOSED"]
+            if hasattr(pygame, name)
+        )
+        # Maximum time to wait for a new frame before handling events
+        self.event_interval = 0.02
 
         self.__initGL()
+        self.__overlaySetup()
 
-        self.decoder = Decoder(
-            videorenderfunc=self.__texUpdate,
-        )
-        self.texture_locked = False
+        # The frames are taken from the decoder's mailbox, so no callback is
+        # needed
+        self.decoder = Decoder()
 
     def __initGL(self):
         glViewport(0, 0, self.windowSize[0], self.windowSize[1])
@@ -124,7 +206,7 @@ class VideoPlayer:
         self.decoder.load_media(vidSource)
         self.decoder.loop = self.loop
         pygame.display.set_caption(os.path.split(vidSource)[1])
-        self.vidsize = self.decoder.clip.size
+        self.vidsize = self.decoder.resolution
 
         self.destsize = self.calc_scaled_res(self.windowSize, self.vidsize)
         self.vidPos = (
@@ -135,22 +217,11 @@ class VideoPlayer:
         self.__textureSetup()
 
         if self.decoder.audioformat:
-            if self.soundrenderer == "pygame":
-                from mediadecoder.soundrenderers import SoundrendererPygame
-
-                self.audio = SoundrendererPygame(self.decoder.audioformat)
-            elif self.soundrenderer == "pyaudio":
-                from mediadecoder.soundrenderers.pyaudiorenderer import (
-                    SoundrendererPyAudio,
-                )
-
-                self.audio = SoundrendererPyAudio(self.decoder.audioformat)
-            elif self.soundrenderer == "sounddevice":
-                from mediadecoder.soundrenderers.sounddevicerenderer import (
-                    SoundrendererSounddevice,
-                )
-
-                self.audio = SoundrendererSounddevice(self.decoder.audioformat)
+            from mediadecoder.soundrenderers import get_renderer
+
+            # Only the module of the selected renderer is imported
+            renderer = get_renderer(self.soundrenderer)
+            self.audio = renderer(self.decoder.audioformat)
             self.decoder.set_audiorenderer(self.audio)
 
     def __textureSetup(self):
@@ -201,19 +272,85 @@ class VideoPlayer:
         # Clear The Screen And The Depth Buffer
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
+    def __overlaySetup(self):
+        # Texture to which the statistics overlay is rendered
+        pygame.font.init()
+        self.font = pygame.font.SysFont(None, 20)
+        self.overlayTexture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.overlayTexture)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        self.overlaySize = None
+
+    def __overlayUpdate(self):
+        """Renders the statistics to the overlay texture."""
+        lines = [self.font.render(line, True, (255, 255, 255))
+                 for line in self.stats.lines()]
+        padding = 4
+        width = max(line.get_width() for line in lines) + 2 * padding
+        height = sum(line.get_height() for line in lines) + 2 * padding
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 160))
+        y = padding
+        for line in lines:
+            surface.blit(line, (padding, y))
+            y += line.get_height()
+
+        glBindTexture(GL_TEXTURE_2D, self.overlayTexture)
+        glTexImage2D(
+            GL_TEXTURE_2D,
+            0,
+            GL_RGBA,
+            width,
+            height,
+            0,
+            GL_RGBA,
+            GL_UNSIGNED_BYTE,
+            pygame.image.tostring(surface, "RGBA", False),
+        )
+        glBindTexture(GL_TEXTURE_2D, self.textureNo)
+        self.overlaySize = (width, height)
+
+    def __drawOverlay(self):
+        """Draws the statistics overlay in the top left corner."""
+        if self.overlaySize is None:
+            self.__overlayUpdate()
+        (x, y) = (10, 10)
+        (w, h) = self.overlaySize
+        glBindTexture(GL_TEXTURE_2D, self.overlayTexture)
+        glBegin(GL_QUADS)
+        glTexCoord2f(0.0, 0.0)
+        glVertex3i(x, y, 0)
+        glTexCoord2f(1.0, 0.0)
+        glVertex3i(x + w, y, 0)
+        glTexCoord2f(1.0, 1.0)
+        glVertex3i(x + w, y + h, 0)
+        glTexCoord2f(0.0, 1.0)
+        glVertex3i(x, y + h, 0)
+        glEnd()
+        glBindTexture(GL_TEXTURE_2D, self.textureNo)
+
     def __texUpdate(self, frame):
-        """Update the texture with the newly supplied frame."""
-        # Retrieve buffer from videosink
-        if self.texture_locked:
-            return
-        self.buffer = frame
-        self.texUpdated = True
+        """Uploads a new frame to the texture."""
+        glTexSubImage2D(
+            GL_TEXTURE_2D,
+            0,
+            0,
+            0,
+            self.vidsize[0],
+            self.vidsize[1],
+            GL_RGB,
+            GL_UNSIGNED_BYTE,
+            frame,
+        )
 
     def __drawFrame(self):
         """Draws a single frame."""
         # Clear The Screen And The Depth Buffer
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glCallList(self.frameQuad)
+        if self.show_stats:
+            self.__drawOverlay()
 
     def play(self):
         """Starts playback."""
@@ -226,61 +363,40 @@ class VideoPlayer:
 
         self.decoder.play()
 
-        # While video is playing, render frames
+        # The window is only redrawn when a new frame has arrived or a window
+        # event requires it. In between, the loop blocks until the decoder has
+        # rendered a new frame, instead of polling.
+        sequence = 0
+        redraw = True
         while self.decoder.status in [mediadecoder.PLAYING, mediadecoder.PAUSED]:
-            texture_update_time = 0
-            if self.texUpdated:
-                t1 = time.time()
-                # Update texture
-                self.texture_locked = True
-                glTexSubImage2D(
-                    GL_TEXTURE_2D,
-                    0,
-                    0,
-                    0,
-                    self.vidsize[0],
-                    self.vidsize[1],
-                    GL_RGB,
-                    GL_UNSIGNED_BYTE,
-                    self.buffer,
-                )
-                self.texture_locked = False
-                texture_update_time = int((time.time() - t1) * 1000)
-                self.texUpdated = False
-
-            # Draw the texture to the back buffer
-            t1 = time.time()
-            self.__drawFrame()
-            draw_time = (time.time() - t1) * 1000
-            # Flip the buffer to show frame to screen
-            t1 = time.time()
-            pygame.display.flip()
-            flip_time = (time.time() - t1) * 1000
-
-            logger.debug(
-                "================== Frame {} ========================".format(
-                    self.decoder.current_frame_no
-                )
-            )
-            if texture_update_time:
-                logger.debug("Texture updated in {0} ms".format(texture_update_time))
-            logger.debug("Texture drawn in {0} ms".format(draw_time))
-            logger.debug("Screen flipped in {0} ms".format(flip_time))
-            logger.debug("-----------------------------------------------------")
-            logger.debug(
-                "Total: {} ms".format(texture_update_time + draw_time + flip_time)
-            )
+            latest = self.decoder.wait_for_frame(sequence, self.event_interval)
+            if not latest is None:
+                # Frames that were rendered by the decoder but never shown
+                dropped = max(0, latest.sequence - sequence - 1) if sequence else 0
+                sequence = latest.sequence
+
+                t1 = time.perf_counter()
+                self.__texUpdate(latest.frame)
+                self.stats.add("upload", time.perf_counter() - t1)
+                self.stats.frame(dropped)
+                redraw = True
 
             for e in pygame.event.get():
                 if e.type == pygame.QUIT:
                     self.stop()
-                if e.type == pygame.KEYDOWN:
+                elif e.type in self.redraw_events:
+                    redraw = True
+                elif e.type == pygame.KEYDOWN:
                     # Quitting
                     if e.key == pygame.K_ESCAPE:
                         self.stop()
                     # Pausing
                     elif e.key == pygame.K_SPACE:
                         self.pause()
+                    # Statistics overlay
+                    elif e.key == pygame.K_i:
+                        self.show_stats = not self.show_stats
+                        redraw = True
                     # Seeking
                     elif e.key == pygame.K_RIGHT:
                         new_time = min(
@@ -291,10 +407,22 @@ class VideoPlayer:
                         new_time = max(self.decoder.current_playtime - 10, 0)
                         self.decoder.seek(new_time)
 
-            pygame.event.pump()  # Prevent freezing of screen while dragging
-
-            # Without this sleep, the video rendering threard goes haywire...
-            time.sleep(0.005)
+            if self.stats.update():
+                logger.debug("Presentation: {}".format(", ".join(self.stats.lines())))
+                if self.show_stats:
+                    self.__overlayUpdate()
+                    redraw = True
+
+            if redraw:
+                # Draw the texture to the back buffer
+                t1 = time.perf_counter()
+                self.__drawFrame()
+                self.stats.add("draw", time.perf_counter() - t1)
+                # Flip the buffer to show frame to screen
+                t1 = time.perf_counter()
+                pygame.display.flip()
+                self.stats.add("flip", time.perf_counter() - t1)
+                redraw = False
 
         if self.decoder.audioformat:
             self.audio.close_stream()
@@ -337,9 +465,21 @@ if __name__ == "__main__":
         "-s",
         "--soundrenderer",
         help="the backend that should  render the sound (default: sounddevice)",
-        choices=["pygame", "pyaudio", "sounddevice"],
+        # The wave renderer needs a file name, so it can not be selected here
+        choices=[
+            name
+            for name in mediadecoder.soundrenderers.available_renderers()
+            if name != "wave"
+        ],
         default="sounddevice",
     )
+    parser.add_argument(
+        "-i",
+        "--stats",
+        help="show the presentation timings (toggle with the i key)",
+        action="store_true",
+        default=False,
+    )
     parser.add_argument(
         "-r",
         "--resolution",
@@ -363,6 +503,7 @@ if __name__ == "__main__":
         fullscreen=args.fullscreen,
         soundrenderer=args.soundrenderer,
         loop=args.loop,
+        show_stats=args.stats,
     )
     myVideoPlayer.load_media(args.mediafile)
     logging.debug("Starting video")